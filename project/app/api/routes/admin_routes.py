@@ -11,6 +11,7 @@ from ...database.schemas import (
     UserCreateAdminSchema,
     AdminUserEdit,
     UserOut,
+    AtivarVersaoModeloSchema,
 )
 from ...core.security import get_password_hash
 from ...database import models
@@ -19,6 +20,7 @@ from ...core.hierarchy import require_role, RoleEnum
 
 from ...core.security import generate_invite_token
 from ...utils.send_email import send_invite_email
+from ...utils import registro_modelos
 
 
 router = APIRouter()
@@ -231,3 +233,31 @@ async def editar_usuario(
     await db.refresh(user)
 
     return user
+
+
+@router.get("/admin/modelos")
+async def listar_versoes_modelos(
+    current_user: models.User = Depends(require_role(RoleEnum.ADMIN)),
+):
+    return await registro_modelos.situacao()
+
+
+@router.post("/admin/modelos/ativar")
+async def ativar_versao_modelos(
+    dados: AtivarVersaoModeloSchema,
+    current_user: models.User = Depends(require_role(RoleEnum.ADMIN)),
+):
+    # Os modelos da nova versão são carregados e aquecidos antes da troca: as
+    # análises em andamento terminam na versão anterior
+    try:
+        resultado = await registro_modelos.ativar(dados.versao)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Erro ao ativar a versão de modelos {dados.versao}: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Erro ao carregar a versão {dados.versao}."
+        )
+
+    print(f"Usuário {current_user.id} ativou a versão de modelos {dados.versao}.")
+    return {"message": "Versão de modelos ativada.", **resultado}
@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    UploadFile,
+    File,
+    Form,
+    Query,
+)
+from fastapi.responses import JSONResponse
 from typing import List
+import asyncio
+import os
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from ...database.database import get_db
 from ...core.hierarchy import require_role, RoleEnum
+from ...core.security import generate_upload_token, verify_upload_token
 from ...database import models
 from ...database.schemas import (
     PacienteCreateSchema,
@@ -17,11 +30,30 @@ from ...database.schemas import (
     FatoresRiscoProtecaoCreateSchema,
     InvestigacaoLesoesSuspeitasCreateSchema,
     InformacoesCompletasCreateSchema,
+    TipoUploadDiretoEnum,
+    UploadDiretoUrlSchema,
+    UploadDiretoConcluidoSchema,
+)
+from ...utils.minio import (
+    upload_to_minio,
+    remove_from_minio,
+    agendar_uploads,
+    gerar_nome_objeto,
+    gerar_url_upload,
+    verificar_objeto,
+    minio_url_expiracao,
 )
-from ...utils.minio import upload_to_minio
-from ...utils.detectar_lesao import classificar_tipo_lesao
-from ...utils.machine_learning import classificar_imagem_pele
-from ...utils.qualidade_imagem import avaliar_qualidade_imagem
+from ...utils.analise_lesao import (
+    analisar_qualidade,
+    avaliar_previa,
+    classificar_analise,
+    criar_predicao,
+    versao_do_resultado,
+)
+from ...utils.tarefas_analise import criar_tarefa, processar_tarefa
+from ...utils.admissao import admissao_inferencia
+from ...utils.modo_sombra import agendar_sombra
+from ...utils.imagem import ml_qualidade_lado_max, ml_qualidade_reduzida
 
 router = APIRouter()
 
@@ -446,12 +478,80 @@ async def listar_atendimentos_usuario_logado(
     return atendimentos_list
 
 
+# Prévias maiores que isso indicam que o app enviou a foto original
+TAMANHO_MAX_PREVIA_MB = 5
+
+
+@router.post("/avaliar-qualidade")
+async def avaliar_qualidade(
+    file: UploadFile = File(...),
+    current_user: models.User = Depends(require_role(RoleEnum.PESQUISADOR)),
+):
+    """
+    Avalia apenas a qualidade de uma prévia reduzida da foto, sem cadastrar
+    nada, para o app descartar fotos ruins antes do envio em resolução cheia.
+    Prévias com até `lado_max_recomendado` px no maior lado são avaliadas na
+    mesma resolução usada por /cadastrar-lesao; None quando /cadastrar-lesao
+    avalia a foto na resolução original (ML_QUALIDADE_REDUZIDA desligado).
+    """
+    conteudo = await file.read()
+
+    if len(conteudo) > TAMANHO_MAX_PREVIA_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Prévia muito grande. Tamanho máximo: {TAMANHO_MAX_PREVIA_MB}MB",
+        )
+
+    async with admissao_inferencia.admitir():
+        qualidade = await avaliar_previa(conteudo)
+
+    return {
+        "arquivo": file.filename,
+        "score": qualidade.get("score"),
+        "qualidade": qualidade["qualidade"],
+        "aprovada": qualidade["qualidade"] == "boa",
+        "erro": qualidade.get("erro"),
+        "lado_max_recomendado": ml_qualidade_lado_max if ml_qualidade_reduzida else None,
+    }
+
+
+async def _classificar_imagens(analises: list) -> list:
+    """
+    Classifica as imagens já aprovadas na qualidade. A vaga de inferência só é
+    ocupada aqui, e não durante uploads e commit; como a requisição já foi
+    admitida na etapa de qualidade, aguarda a vaga em vez de recusar.
+    """
+    async with admissao_inferencia.admitir(rejeitar=False):
+        return await asyncio.gather(
+            *(classificar_analise(analise) for analise in analises),
+            return_exceptions=True,
+        )
+
+
+async def _encerrar_tarefas(tarefas: list):
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+
+
+async def _descartar_lesao(db: AsyncSession, lesao, uploads: list):
+    await db.rollback()
+    await db.delete(lesao)
+    await db.commit()
+
+    for upload in uploads:
+        if not upload.cancelled() and upload.exception() is None:
+            await remove_from_minio(upload.result()["url"])
+
+
 @router.post("/cadastrar-lesao")
 async def cadastrar_lesao(
+    background_tasks: BackgroundTasks,
     atendimento_id: int = Form(...),
     local_lesao_id: int = Form(...),
     descricao_lesao: str = Form(...),
     files: List[UploadFile] = File(None),
+    modo_assincrono: bool = Form(False),
     db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_role(RoleEnum.PESQUISADOR)),
 ):
@@ -473,6 +573,32 @@ async def cadastrar_lesao(
     if not local_lesao:
         raise HTTPException(status_code=404, detail="Local de lesão não encontrado")
 
+    # A qualidade é avaliada antes de criar a lesão: uma recusa (400, ou 503
+    # com Retry-After) não deixa no banco uma lesão sem imagens
+    analises = []
+    conteudos = []
+    if files and not modo_assincrono:
+        # Limita quantas requisições rodam inferência ao mesmo tempo; acima da
+        # fila configurada o cliente recebe 503 com Retry-After
+        async with admissao_inferencia.admitir():
+            # Cada imagem é decodificada uma única vez (ou vem do cache); as
+            # entradas dos modelos ficam em analises para a etapa de classificação
+            for file in files:
+                file_content = await file.read()
+                conteudos.append(file_content)
+                analise = await analisar_qualidade(file_content)
+                qualidade = analise["resultado"]["qualidade"]
+
+                if qualidade["qualidade"] != "boa":
+                    erro_msg = qualidade.get("erro", "Qualidade inferior a boa.")
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"A imagem '{file.filename}' foi rejeitada: {erro_msg} (score: {qualidade.get('score')}). Envie apenas imagens com qualidade boa.",
+                    )
+
+                analises.append(analise)
+                file.file.seek(0)
+
     # Cria registro da lesão
     new_lesao = models.RegistroLesoes(
         local_lesao_id=local_lesao_id,
@@ -483,70 +609,296 @@ async def cadastrar_lesao(
     await db.commit()
     await db.refresh(new_lesao)
 
+    lesao_info = {
+        "id": new_lesao.id,
+        "local_lesao_id": new_lesao.local_lesao_id,
+        "local_lesao_nome": local_lesao.nome,
+        "descricao_lesao": new_lesao.descricao_lesao,
+    }
+
+    if modo_assincrono and files:
+        # As imagens são analisadas em segundo plano; o cliente acompanha
+        # o progresso em /analise-lesao/{tarefa_id}
+        arquivos = [
+            {
+                "nome": file.filename,
+                "content_type": file.content_type,
+                "conteudo": await file.read(),
+            }
+            for file in files
+        ]
+        tarefa = await criar_tarefa(db, new_lesao.id, [a["nome"] for a in arquivos])
+        background_tasks.add_task(processar_tarefa, tarefa.id, arquivos)
+
+        return JSONResponse(
+            status_code=202,
+            content={
+                "message": "Lesão cadastrada. As imagens estão em análise.",
+                "lesao": lesao_info,
+                "tarefa_id": tarefa.id,
+            },
+        )
+
     imagens_urls = []
     tipos = []
     diagnosticos = []
     descricoes_lesao = []
+    versoes_modelo = []
 
     if files:
-        for file in files:
-            file_content = await file.read()
-            qualidade = avaliar_qualidade_imagem(file_content)
-
-            if qualidade["qualidade"] != "boa":
-                erro_msg = qualidade.get("erro", "Qualidade inferior a boa.")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"A imagem '{file.filename}' foi rejeitada: {erro_msg} (score: {qualidade.get('score')}). Envie apenas imagens com qualidade boa.",
-                )
-
-            file.file.seek(0)
-
-        for file in files:
-            try:
-                arquivo_metadata = await upload_to_minio(
-                    file, folder_name="imagens-lesoes"
-                )
-                imagens_urls.append(arquivo_metadata["url"])
-                print(f"Imagem {file.filename} carregada com sucesso para o MinIO.")
-
-                new_imagem = models.RegistroLesoesImagens(
-                    arquivo_path=arquivo_metadata["url"],
-                    registro_lesoes_id=new_lesao.id,
-                )
-                db.add(new_imagem)
-
-                file_content = await file.read()
-
-                diagnostico = await classificar_imagem_pele(file_content)
-                diagnosticos.append(diagnostico["nome_traduzido"])
-                descricoes_lesao.append(diagnostico["descricao"])
-                print(f"Imagem {file.filename} classificada como {diagnostico}.")
-
-                tipo = await classificar_tipo_lesao(file_content)
-                tipos.append(tipo)
-                print(f"Imagem {file.filename} classificada como tipo {tipo}.")
-            except Exception as e:
-                print(f"Erro ao processar imagem {file.filename}: {str(e)}")
-                continue
+        # Os uploads (até MINIO_UPLOADS_SIMULTANEOS por vez) e as classificações
+        # andam juntos; os resultados são consumidos na ordem dos arquivos
+        uploads = agendar_uploads(files, folder_name="imagens-lesoes")
+        classificacao = asyncio.create_task(_classificar_imagens(analises))
+
+        # Imagens registradas, para o modelo sombra depois do commit
+        sombras = []
+        try:
+            for indice, (file, upload, analise, file_content) in enumerate(
+                zip(files, uploads, analises, conteudos)
+            ):
+                try:
+                    arquivo_metadata = await upload
+                    imagens_urls.append(arquivo_metadata["url"])
+                    print(f"Imagem {file.filename} carregada com sucesso para o MinIO.")
+
+                    new_imagem = models.RegistroLesoesImagens(
+                        arquivo_path=arquivo_metadata["url"],
+                        registro_lesoes_id=new_lesao.id,
+                    )
+                    db.add(new_imagem)
+
+                    resultado = (await classificacao)[indice]
+                    if isinstance(resultado, Exception):
+                        raise resultado
+                    db.add(criar_predicao(new_imagem, analise))
+                    sombras.append((new_imagem, file_content, resultado))
+
+                    diagnostico = resultado["diagnostico"]
+                    diagnosticos.append(diagnostico["nome_traduzido"])
+                    descricoes_lesao.append(diagnostico["descricao"])
+                    print(f"Imagem {file.filename} classificada como {diagnostico}.")
+
+                    tipo = resultado["tipo"]
+                    tipos.append(tipo)
+                    versoes_modelo.append(versao_do_resultado(resultado))
+                    print(f"Imagem {file.filename} classificada como tipo {tipo}.")
+                except HTTPException as e:
+                    # Sobrecarga ou timeout da inferência devem chegar ao cliente
+                    if e.status_code in (503, 504):
+                        raise e
+                    print(f"Erro ao processar imagem {file.filename}: {str(e.detail)}")
+                    continue
+                except Exception as e:
+                    print(f"Erro ao processar imagem {file.filename}: {str(e)}")
+                    continue
+        except HTTPException as e:
+            # O cliente vai repetir o envio (Retry-After): desfaz o cadastro para
+            # não acumular lesões sem imagens
+            await _encerrar_tarefas(uploads + [classificacao])
+            await _descartar_lesao(db, new_lesao, uploads)
+            raise e
+        finally:
+            # Em caso de erro, nenhuma tarefa continua depois da resposta
+            await _encerrar_tarefas(uploads + [classificacao])
 
         await db.commit()
 
+        for new_imagem, file_content, resultado in sombras:
+            agendar_sombra(new_imagem.id, file_content, resultado)
+
     return {
         "message": "Lesão e imagens cadastradas com sucesso!",
-        "lesao": {
-            "id": new_lesao.id,
-            "local_lesao_id": new_lesao.local_lesao_id,
-            "local_lesao_nome": local_lesao.nome,
-            "descricao_lesao": new_lesao.descricao_lesao,
-        },
+        "lesao": lesao_info,
         "imagens": imagens_urls,
         "tipos": tipos,
         "prediagnosticos": diagnosticos,
         "descricoes-lesao": descricoes_lesao,
+        "versoes-modelo": versoes_modelo,
+    }
+
+
+@router.get("/analise-lesao/{tarefa_id}")
+async def consultar_analise_lesao(
+    tarefa_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_role(RoleEnum.PESQUISADOR)),
+):
+    tarefa = await db.get(models.TarefaAnaliseLesao, tarefa_id)
+
+    if not tarefa:
+        raise HTTPException(status_code=404, detail="Tarefa de análise não encontrada")
+
+    return {
+        "tarefa_id": tarefa.id,
+        "lesao_id": tarefa.registro_lesoes_id,
+        "status": tarefa.status,
+        "imagens": tarefa.resultados,
     }
 
 
+# Upload direto ao MinIO: pasta e tipos aceitos de cada destino
+DESTINOS_UPLOAD_DIRETO = {
+    TipoUploadDiretoEnum.imagem_lesao: (
+        "imagens-lesoes",
+        ["image/jpeg", "image/png", "image/webp"],
+    ),
+    TipoUploadDiretoEnum.termo_consentimento: (
+        "termos-consentimento",
+        ["application/pdf", "image/jpeg", "image/png"],
+    ),
+}
+
+
+async def _buscar_destino_upload(db: AsyncSession, tipo, referencia_id: int):
+    if tipo == TipoUploadDiretoEnum.imagem_lesao:
+        lesao = await db.get(models.RegistroLesoes, referencia_id)
+        if not lesao:
+            raise HTTPException(status_code=404, detail="Lesão não encontrada")
+        return lesao
+
+    atendimento = await db.get(models.Atendimento, referencia_id)
+    if not atendimento:
+        raise HTTPException(status_code=404, detail="Atendimento não encontrado")
+
+    if atendimento.termo_consentimento_id:
+        raise HTTPException(
+            status_code=400, detail="Atendimento já possui um termo de consentimento"
+        )
+    return atendimento
+
+
+@router.post("/upload-direto/url")
+async def gerar_url_upload_direto(
+    dados: UploadDiretoUrlSchema,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_role(RoleEnum.PESQUISADOR)),
+):
+    """
+    Gera uma URL pré-assinada para o cliente enviar a imagem da lesão ou o
+    termo de consentimento direto ao MinIO, sem passar pela API. Depois do
+    envio, o cliente chama /upload-direto/concluido com o object_name e o
+    token devolvidos aqui.
+    """
+    await _buscar_destino_upload(db, dados.tipo, dados.referencia_id)
+
+    folder_name, allowed_types = DESTINOS_UPLOAD_DIRETO[dados.tipo]
+    if dados.content_type not in allowed_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de arquivo não permitido. Tipos aceitos: {', '.join(allowed_types)}",
+        )
+
+    object_name = gerar_nome_objeto(folder_name, dados.nome_arquivo)
+
+    return {
+        "url": gerar_url_upload(object_name),
+        "metodo": "PUT",
+        "headers": {"Content-Type": dados.content_type},
+        "object_name": object_name,
+        "token": generate_upload_token(
+            object_name,
+            dados.tipo.value,
+            dados.referencia_id,
+            current_user.id,
+            minio_url_expiracao,
+        ),
+        "expira_em_segundos": minio_url_expiracao,
+    }
+
+
+@router.post("/upload-direto/concluido")
+async def concluir_upload_direto(
+    dados: UploadDiretoConcluidoSchema,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_role(RoleEnum.PESQUISADOR)),
+):
+    """
+    Confere o arquivo enviado pela URL pré-assinada (tamanho, tipo e MD5) e o
+    registra. Imagens de lesão são analisadas em segundo plano, como no modo
+    assíncrono de /cadastrar-lesao.
+    """
+    folder_name, allowed_types = DESTINOS_UPLOAD_DIRETO[dados.tipo]
+
+    # Só objetos gerados por /upload-direto/url para esse destino
+    if not dados.object_name.startswith(f"{folder_name}/{folder_name}_") or (
+        "/" in dados.object_name[len(folder_name) + 1 :]
+    ):
+        raise HTTPException(status_code=400, detail="Arquivo inválido para este destino")
+
+    # Só quem pediu a URL conclui (e, se a verificação falhar, remove) o envio
+    if not verify_upload_token(
+        dados.token,
+        dados.object_name,
+        dados.tipo.value,
+        dados.referencia_id,
+        current_user.id,
+    ):
+        raise HTTPException(
+            status_code=403, detail="Token de upload inválido para este arquivo"
+        )
+
+    destino = await _buscar_destino_upload(db, dados.tipo, dados.referencia_id)
+
+    if dados.tipo == TipoUploadDiretoEnum.imagem_lesao:
+        modelo = models.RegistroLesoesImagens
+    else:
+        modelo = models.TermoConsentimento
+
+    stmt = select(modelo.id).filter(modelo.arquivo_path == dados.object_name)
+    if (await db.execute(stmt)).first():
+        raise HTTPException(status_code=400, detail="Arquivo já registrado")
+
+    arquivo_metadata = await verificar_objeto(
+        dados.object_name, dados.md5, allowed_types=allowed_types
+    )
+
+    if dados.tipo == TipoUploadDiretoEnum.termo_consentimento:
+        new_termo = models.TermoConsentimento(arquivo_path=arquivo_metadata["url"])
+        db.add(new_termo)
+        await db.commit()
+        await db.refresh(new_termo)
+
+        # Associa o termo ao atendimento
+        destino.termo_consentimento_id = new_termo.id
+        await db.commit()
+
+        return {
+            "message": "Termo de Consentimento cadastrado com sucesso!",
+            "termo_consentimento": {
+                "id": new_termo.id,
+                "arquivo_path": arquivo_metadata["url"],
+            },
+        }
+
+    # A imagem é baixada do MinIO e analisada em segundo plano; o registro é
+    # criado se a qualidade for boa (senão o objeto é removido)
+    nome = os.path.basename(arquivo_metadata["url"])
+    tarefa = await criar_tarefa(db, destino.id, [nome])
+    background_tasks.add_task(
+        processar_tarefa,
+        tarefa.id,
+        [
+            {
+                "nome": nome,
+                "content_type": arquivo_metadata["content_type"],
+                "conteudo": None,
+                "arquivo_path": arquivo_metadata["url"],
+            }
+        ],
+    )
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "Imagem recebida. A análise está em andamento.",
+            "lesao_id": destino.id,
+            "tarefa_id": tarefa.id,
+        },
+    )
+
+
 @router.get("/listar-lesoes/{atendimento_id}")
 async def listar_lesoes(
     atendimento_id: int,
@@ -567,12 +919,18 @@ async def listar_lesoes(
     lesoes_list = []
 
     for lesao in lesoes:
-        # Obtendo imagens associadas à lesão
-        stmt_imagens = select(models.RegistroLesoesImagens).filter(
-            models.RegistroLesoesImagens.registro_lesoes_id == lesao.id
+        # Obtendo imagens associadas à lesão e as predições já calculadas
+        stmt_imagens = (
+            select(models.RegistroLesoesImagens, models.PredicaoImagem)
+            .outerjoin(
+                models.PredicaoImagem,
+                models.PredicaoImagem.registro_lesoes_imagens_id
+                == models.RegistroLesoesImagens.id,
+            )
+            .filter(models.RegistroLesoesImagens.registro_lesoes_id == lesao.id)
         )
         result_imagens = await db.execute(stmt_imagens)
-        imagens = result_imagens.scalars().all()
+        imagens = result_imagens.all()
 
         # Get local lesao name if available
         local_lesao_name = None
@@ -591,7 +949,22 @@ async def listar_lesoes(
                 "local_lesao_id": lesao.local_lesao_id,
                 "local_lesao_nome": local_lesao_name,
                 "descricao_lesao": lesao.descricao_lesao,
-                "imagens": [imagem.arquivo_path for imagem in imagens],
+                "imagens": [imagem.arquivo_path for imagem, _ in imagens],
+                "predicoes": [
+                    {
+                        "arquivo_path": imagem.arquivo_path,
+                        "classe_original": predicao.classe_original,
+                        "prediagnostico": predicao.nome_traduzido,
+                        "descricao_lesao": predicao.descricao,
+                        "tipo": predicao.tipo_lesao,
+                        "score_qualidade": predicao.score_qualidade,
+                        "qualidade": predicao.qualidade,
+                        "versao_modelo": predicao.versao_modelo,
+                        "latencia_ms": predicao.latencia_ms,
+                    }
+                    for imagem, predicao in imagens
+                    if predicao is not None
+                ],
             }
         )
 
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from ...core.hierarchy import require_role, RoleEnum
+from ...database import models
+
+from ...utils.metricas import coletar_metricas
+from ...utils.cliente_inferencia import ml_sidecar_socket, requisitar
+from ...utils.modelos import estado
+
+router = APIRouter()
+
+
+@router.get("/ready")
+async def verificar_prontidao():
+    # Só fica pronto depois que os modelos foram carregados e aquecidos
+    if estado["pronto"]:
+        return {"status": "pronto"}
+
+    if estado["erro"]:
+        return JSONResponse(
+            status_code=503, content={"status": "erro", "detalhe": estado["erro"]}
+        )
+
+    return JSONResponse(status_code=503, content={"status": "aquecendo"})
+
+
+@router.get("/metricas")
+async def listar_metricas(
+    current_user: models.User = Depends(require_role(RoleEnum.ADMIN)),
+):
+    # Detalhes operacionais (lotes, filas, versões): só para administradores
+    metricas = coletar_metricas()
+    if ml_sidecar_socket:
+        # Micro-batching, cascata e executor rodam no processo do sidecar
+        try:
+            metricas["sidecar"] = await requisitar({"operacao": "metricas"})
+        except HTTPException as e:
+            metricas["sidecar"] = {"erro": str(e.detail)}
+    return metricas
@@ -72,3 +72,38 @@ def verify_reset_token(token: str):
         return None
     except jwt.InvalidTokenError:
         return None
+
+
+def generate_upload_token(
+    object_name: str,
+    tipo: str,
+    referencia_id: int,
+    user_id: int,
+    expira_em_segundos: int,
+):
+    # Vincula o arquivo ao destino e ao usuário que pediu a URL pré-assinada;
+    # vale por uma hora além da URL, já que o envio pode terminar depois dela
+    expire = datetime.now() + timedelta(seconds=expira_em_segundos, hours=1)
+    payload = {
+        "sub": object_name,
+        "tipo": tipo,
+        "referencia_id": referencia_id,
+        "user_id": user_id,
+        "exp": expire,
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def verify_upload_token(
+    token: str, object_name: str, tipo: str, referencia_id: int, user_id: int
+) -> bool:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    return (
+        payload.get("sub") == object_name
+        and payload.get("tipo") == tipo
+        and payload.get("referencia_id") == referencia_id
+        and payload.get("user_id") == user_id
+    )
@@ -8,6 +8,7 @@ from sqlalchemy import (
     TIMESTAMP,
     Boolean,
     Enum,
+    Float,
     DATE,
     CheckConstraint,
 )
@@ -121,6 +122,49 @@ class RegistroLesoesImagens(Base):
     registro_lesoes = relationship("RegistroLesoes")
 
 
+class PredicaoImagem(Base):
+    __tablename__ = "predicoesImagens"
+    id = Column(Integer, primary_key=True, index=True)
+    registro_lesoes_imagens_id = Column(
+        Integer,
+        ForeignKey("registroLesoesImagens.id"),
+        unique=True,
+        index=True,
+        nullable=False,
+    )
+    classe_original = Column(String(100), nullable=True)
+    nome_traduzido = Column(String(100), nullable=True)
+    descricao = Column(String(500), nullable=True)
+    tipo_lesao = Column(String(50), nullable=True)
+    score_qualidade = Column(Float, nullable=True)
+    qualidade = Column(String(20), nullable=True)
+    versao_modelo = Column(String(300), nullable=False)
+    latencia_ms = Column(Float, nullable=True)
+    data_criacao = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+    imagem = relationship("RegistroLesoesImagens")
+
+
+# Predições de um modelo candidato (modo sombra), nunca exibidas ao usuário
+class PredicaoSombra(Base):
+    __tablename__ = "predicoesSombra"
+    id = Column(Integer, primary_key=True, index=True)
+    registro_lesoes_imagens_id = Column(
+        Integer, ForeignKey("registroLesoesImagens.id"), index=True, nullable=False
+    )
+    versao_modelo = Column(String(300), index=True, nullable=False)
+    classe_original = Column(String(100), nullable=True)
+    confianca = Column(Float, nullable=True)
+    tipo_lesao = Column(String(50), nullable=True)
+    # Comparação com a predição de produção da mesma imagem
+    classe_producao = Column(String(100), nullable=True)
+    tipo_producao = Column(String(50), nullable=True)
+    concorda_classe = Column(Boolean, nullable=True)
+    concorda_tipo = Column(Boolean, nullable=True)
+    latencia_ms = Column(Float, nullable=True)
+    data_criacao = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+
 class LocalLesao(Base):
     __tablename__ = "locais_lesao"
     id = Column(Integer, primary_key=True, index=True)
@@ -316,3 +360,31 @@ class InvestigacaoLesoesSuspeitas(Base):
 
     consulta_medica = Column(Boolean, nullable=False, default=False)
     diagnostico_lesoes = Column(String(300), nullable=True)
+
+
+class CacheInferencia(Base):
+    __tablename__ = "cacheInferencia"
+    hash_imagem = Column(String(64), primary_key=True)
+    versao_modelo = Column(String(300), primary_key=True)
+    resultado = Column(JSON, nullable=False)
+    data_criacao = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    ultimo_acesso = Column(
+        TIMESTAMP, server_default=func.now(), nullable=False, index=True
+    )
+
+
+class TarefaAnaliseLesao(Base):
+    __tablename__ = "tarefasAnaliseLesao"
+    id = Column(String(32), primary_key=True)
+    registro_lesoes_id = Column(
+        Integer, ForeignKey("registroLesoes.id"), index=True, nullable=False
+    )
+    status = Column(String(20), nullable=False, default="pendente")
+    # Um item por imagem, na ordem de envio: status e resultado da análise
+    resultados = Column(JSON, nullable=False, default=list)
+    data_criacao = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    data_atualizacao = Column(
+        TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    registro_lesoes = relationship("RegistroLesoes")
@@ -30,6 +30,10 @@ class AdminUserEdit(BaseModel):
     fl_ativo: Optional[bool] = None
 
 
+class AtivarVersaoModeloSchema(BaseModel):
+    versao: str
+
+
 class Token(BaseModel):
     access_token: str
     refresh_token: str
@@ -144,6 +148,29 @@ class TermoConsentimentoCreateSchema(BaseModel):
     arquivo_path: str
 
 
+class TipoUploadDiretoEnum(str, Enum):
+    imagem_lesao = "imagem-lesao"
+    termo_consentimento = "termo-consentimento"
+
+
+class UploadDiretoUrlSchema(BaseModel):
+    tipo: TipoUploadDiretoEnum
+    # registro_lesoes_id (imagem-lesao) ou atendimento_id (termo-consentimento)
+    referencia_id: int
+    nome_arquivo: str
+    content_type: str
+
+
+class UploadDiretoConcluidoSchema(BaseModel):
+    tipo: TipoUploadDiretoEnum
+    referencia_id: int
+    object_name: str
+    # MD5 (hex) do arquivo, calculado pelo cliente
+    md5: str
+    # Token devolvido por /upload-direto/url junto com o object_name
+    token: str
+
+
 class FrequenciaAtividadeFisicaEnum(str, Enum):
     diaria = "Diária"
     frequente = "Frequente"
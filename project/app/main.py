@@ -11,24 +11,27 @@ from app.api.routes import (
     unidade_saude_routes,
     atendimento_routes,
     redirect_routes,
+    status_routes,
 )
 from app.database import models, database
 from app.database.seed import seed_data, populate_data
+from app.utils.executor_inferencia import encerrar_executor
+from app.utils.modo_sombra import encerrar_sombra
+from app.utils.modelos import iniciar_aquecimento
+from app.utils.minio import iniciar_minio
+from app.utils.executor_armazenamento import encerrar_armazenamento
 from contextlib import asynccontextmanager
+import asyncio
+import os
 from fastapi.middleware.cors import CORSMiddleware
 
 
 # from app.database.populate_db import populate_db
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+async def inicializar_banco():
     """
-    Gerenciador de contexto para o ciclo de vida da aplicação
-        args:
-            app (FastAPI): Instância da aplicação FastAPI
-        yields: None
-        description: Cria as tabelas do banco de dados e popula com dados iniciais
+    Cria as tabelas do banco de dados e popula com dados iniciais
     """
     async with database.engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.drop_all)
@@ -43,7 +46,32 @@ async def lifespan(app: FastAPI):
 
     print("Seed data inserted successfully")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Gerenciador de contexto para o ciclo de vida da aplicação
+        args:
+            app (FastAPI): Instância da aplicação FastAPI
+        yields: None
+        description: Inicializa o banco de dados (exceto quando o master do
+            gunicorn já o fez) e inicia o aquecimento dos modelos e o cliente do
+            MinIO em segundo plano
+    """
+    if os.getenv("BANCO_INICIALIZADO") != "True":
+        await inicializar_banco()
+
+    # Os modelos carregam em segundo plano; rotas sem ML já ficam disponíveis
+    aquecimento = asyncio.create_task(iniciar_aquecimento())
+    # Cliente do MinIO e bucket prontos antes do primeiro upload
+    inicio_minio = asyncio.create_task(asyncio.to_thread(iniciar_minio))
+
     yield
+    aquecimento.cancel()
+    inicio_minio.cancel()
+    encerrar_executor()
+    encerrar_sombra()
+    encerrar_armazenamento()
     print("Application is shutting down")
 
 
@@ -68,3 +96,4 @@ app.include_router(supervisor_routes.router, tags=["supervisor"])
 app.include_router(unidade_saude_routes.router, tags=["unidade_saude"])
 app.include_router(atendimento_routes.router, tags=["atendimento"])
 app.include_router(redirect_routes.router, tags=["redirect"])
+app.include_router(status_routes.router, tags=["status"])
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+
+from .metricas import contador, histograma
+
+
+# Quantas requisições podem executar inferência ao mesmo tempo
+ml_max_inferencias = int(os.getenv("ML_MAX_INFERENCIAS", 2))
+# Quantas podem aguardar uma vaga antes de o servidor responder 503
+ml_max_fila_admissao = int(os.getenv("ML_MAX_FILA_ADMISSAO", 8))
+# Valor (s) do cabeçalho Retry-After nas respostas 503
+ml_retry_after = int(os.getenv("ML_RETRY_AFTER", 5))
+
+LIMITES_ESPERA_MS = [1, 5, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def erro_sobrecarga(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(ml_retry_after)},
+    )
+
+
+class ControleAdmissao:
+    def __init__(self, nome: str, max_em_execucao: int, max_fila: int):
+        self.max_em_execucao = max(1, max_em_execucao)
+        self.max_fila = max(0, max_fila)
+        self._semaforo = None
+        self._loop = None
+        self._aguardando = 0
+        self._rejeicoes = contador(f"{nome}_rejeicoes")
+        self._espera = histograma(f"{nome}_espera_ms", LIMITES_ESPERA_MS)
+
+    def _obter_semaforo(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaforo = asyncio.Semaphore(self.max_em_execucao)
+            self._loop = loop
+        return self._semaforo
+
+    @asynccontextmanager
+    async def admitir(self, rejeitar: bool = True):
+        """
+        Reserva uma vaga de inferência. Com `rejeitar`, responde 503 com
+        Retry-After quando a fila de espera está cheia; sem ele (tarefas em
+        segundo plano) apenas aguarda.
+        """
+        semaforo = self._obter_semaforo()
+
+        if rejeitar and semaforo.locked() and self._aguardando >= self.max_fila:
+            self._rejeicoes.incrementar()
+            raise erro_sobrecarga(
+                "Servidor ocupado processando outras imagens. Tente novamente em instantes."
+            )
+
+        inicio = time.perf_counter()
+        self._aguardando += 1
+        try:
+            await semaforo.acquire()
+        finally:
+            self._aguardando -= 1
+        self._espera.observar((time.perf_counter() - inicio) * 1000)
+
+        try:
+            yield
+        finally:
+            semaforo.release()
+
+
+admissao_inferencia = ControleAdmissao(
+    "admissao_inferencia", ml_max_inferencias, ml_max_fila_admissao
+)
@@ -0,0 +1,151 @@
+import time
+from fastapi import HTTPException
+from PIL import UnidentifiedImageError
+
+from ..database import models
+from .modelos import garantir_modulos_ml
+from .registro_modelos import versao_ativa, definir_versao_remota
+from .cache_inferencia import calcular_hash, buscar_resultado, salvar_resultado
+from .cliente_inferencia import ml_sidecar_socket, analisar_remoto
+
+# Os módulos de ML (torch) são importados dentro das funções, só quando os
+# modelos rodam no próprio processo (sem ML_SIDECAR_SOCKET)
+
+
+def versao_do_resultado(resultado: dict) -> str:
+    # Versão que classificou a imagem (pode não ser mais a ativa)
+    return resultado.get("versao_modelo") or versao_ativa()
+
+
+def classificacao_valida(resultado: dict) -> bool:
+    diagnostico = resultado["diagnostico"]
+    return diagnostico["classe_original"] is not None and resultado["tipo"] in (
+        "benigno",
+        "maligno",
+    )
+
+
+async def _avaliar_local(file_content: bytes):
+    await garantir_modulos_ml()
+    from .pipeline_imagem import preparar_imagem
+    from .qualidade_imagem import avaliar_qualidade_imagem, IMAGEM_INVALIDA
+
+    entradas = None
+    try:
+        entradas = await preparar_imagem(file_content)
+        # O tensor de qualidade não é mais necessário depois daqui
+        qualidade = await avaliar_qualidade_imagem(entradas.pop("qualidade"))
+    except HTTPException as e:
+        raise e
+    except UnidentifiedImageError:
+        qualidade = dict(IMAGEM_INVALIDA)
+    except Exception as e:
+        qualidade = {"erro": str(e), "score": None, "qualidade": "erro"}
+
+    return {"qualidade": qualidade}, entradas
+
+
+async def avaliar_previa(file_content: bytes) -> dict:
+    """Apenas a qualidade da imagem, sem cache nem classificação."""
+    if ml_sidecar_socket:
+        resultado = await analisar_remoto(file_content, classificar=False)
+        return resultado["qualidade"]
+
+    await garantir_modulos_ml()
+    from .qualidade_imagem import avaliar_qualidade_imagem
+
+    return await avaliar_qualidade_imagem(file_content)
+
+
+async def analisar_qualidade(file_content: bytes) -> dict:
+    """
+    Primeira etapa da análise: consulta o cache e, se necessário, decodifica a
+    imagem e avalia a qualidade. As entradas dos classificadores ficam em
+    "entradas" para a etapa seguinte (classificar_analise).
+    """
+    inicio = time.perf_counter()
+    hash_imagem = calcular_hash(file_content)
+
+    em_cache = await buscar_resultado(hash_imagem)
+    if em_cache is not None:
+        return {
+            "hash": hash_imagem,
+            "resultado": em_cache,
+            "entradas": None,
+            "latencia_ms": (time.perf_counter() - inicio) * 1000,
+        }
+
+    if ml_sidecar_socket:
+        # O sidecar já classifica as imagens boas na mesma requisição
+        resultado = await analisar_remoto(file_content)
+        definir_versao_remota(resultado.get("versao_modelo"))
+        entradas = None
+    else:
+        resultado, entradas = await _avaliar_local(file_content)
+
+    qualidade = resultado["qualidade"]
+
+    # Imagens reprovadas também entram no cache: um reenvio é recusado sem BRISQUE
+    if qualidade["qualidade"] in ("ruim", "péssima"):
+        await salvar_resultado(hash_imagem, resultado)
+    elif "diagnostico" in resultado and classificacao_valida(resultado):
+        await salvar_resultado(hash_imagem, resultado)
+
+    return {
+        "hash": hash_imagem,
+        "resultado": resultado,
+        "entradas": entradas,
+        "latencia_ms": (time.perf_counter() - inicio) * 1000,
+    }
+
+
+async def classificar_analise(analise: dict) -> dict:
+    """
+    Segunda etapa: classifica a imagem aprovada (ViT e, salvo na cascata,
+    ResNet18) e grava o resultado completo no cache.
+    """
+    resultado = analise["resultado"]
+    # Vindo do cache ou do sidecar, a imagem já está classificada
+    if "diagnostico" in resultado:
+        return resultado
+
+    await garantir_modulos_ml()
+    from .cascata import tipo_pela_cascata
+    from .machine_learning import classificar_imagem_pele
+
+    inicio = time.perf_counter()
+    entradas = analise["entradas"]
+    # ResNet18 no mesmo lote e na mesma versão dos modelos do ViT
+    diagnostico = await classificar_imagem_pele(entradas["vit"], entradas["resnet"])
+    tipo = diagnostico.pop("tipo", None)
+    tipo = tipo_pela_cascata(diagnostico) or tipo or "Erro ao classificar a imagem"
+    analise["latencia_ms"] += (time.perf_counter() - inicio) * 1000
+
+    resultado["diagnostico"] = diagnostico
+    resultado["tipo"] = tipo
+    resultado["versao_modelo"] = diagnostico.pop("versao_modelo", None) or versao_ativa()
+    analise["entradas"] = None
+
+    # Não guarda falhas de classificação
+    if classificacao_valida(resultado):
+        await salvar_resultado(analise["hash"], resultado)
+
+    return resultado
+
+
+def criar_predicao(imagem: models.RegistroLesoesImagens, analise: dict):
+    resultado = analise["resultado"]
+    diagnostico = resultado.get("diagnostico", {})
+    qualidade = resultado.get("qualidade", {})
+
+    return models.PredicaoImagem(
+        imagem=imagem,
+        classe_original=diagnostico.get("classe_original"),
+        nome_traduzido=diagnostico.get("nome_traduzido"),
+        descricao=diagnostico.get("descricao"),
+        tipo_lesao=resultado.get("tipo"),
+        score_qualidade=qualidade.get("score"),
+        qualidade=qualidade.get("qualidade"),
+        versao_modelo=versao_do_resultado(resultado),
+        latencia_ms=round(analise["latencia_ms"], 2),
+    )
@@ -0,0 +1,221 @@
+"""
+Backends de inferência para os classificadores (ML_BACKEND):
+
+- eager: modelo PyTorch original (fp32)
+- torchscript: torch.jit.trace + freeze
+- compile: torch.compile
+- int8: quantização dinâmica int8 das camadas Linear
+- onnx: ONNX Runtime em CPU (requer o pacote onnxruntime)
+
+Antes de ativar um backend diferente de eager, as predições dele são
+comparadas com as do modelo eager em um conjunto fixo de imagens
+(ML_GOLDEN_DIR). Se a fração de predições divergentes passar de
+ML_BACKEND_MAX_DIVERGENCIA, o backend é recusado e o eager é usado.
+
+Uso como benchmark:
+    poetry run python -m app.utils.backends_inferencia [--repeticoes 20]
+"""
+
+import argparse
+import json
+import os
+import time
+import torch
+
+from .imagem import decodificar_imagem
+
+
+BACKENDS = ("eager", "torchscript", "compile", "int8", "onnx")
+
+ml_backend = os.getenv("ML_BACKEND", "eager")
+ml_backend_max_divergencia = float(os.getenv("ML_BACKEND_MAX_DIVERGENCIA", 0.0))
+ml_golden_dir = os.getenv("ML_GOLDEN_DIR", "app/utils/data/golden")
+ml_onnx_dir = os.getenv("ML_ONNX_DIR", "app/utils/data/onnx")
+
+EXTENSOES_IMAGEM = (".jpg", ".jpeg", ".png")
+
+
+class SaidaLogits(torch.nn.Module):
+    """Adapta modelos do transformers para devolver apenas os logits."""
+
+    def __init__(self, modelo):
+        super().__init__()
+        self.modelo = modelo
+
+    def forward(self, pixel_values):
+        return self.modelo(pixel_values=pixel_values).logits
+
+
+def carregar_golden(preprocessar) -> torch.Tensor:
+    if not os.path.isdir(ml_golden_dir):
+        return None
+
+    arquivos = sorted(
+        nome for nome in os.listdir(ml_golden_dir) if nome.lower().endswith(EXTENSOES_IMAGEM)
+    )
+    if not arquivos:
+        return None
+
+    tensores = []
+    for nome in arquivos:
+        with open(os.path.join(ml_golden_dir, nome), "rb") as f:
+            tensores.append(preprocessar(decodificar_imagem(f.read())))
+    return torch.stack(tensores)
+
+
+def _exportar_onnx(nome: str, modelo, exemplo: torch.Tensor):
+    import onnxruntime
+
+    os.makedirs(ml_onnx_dir, exist_ok=True)
+    caminho = os.path.join(ml_onnx_dir, f"{nome}.onnx")
+    torch.onnx.export(
+        modelo,
+        exemplo,
+        caminho,
+        input_names=["entrada"],
+        output_names=["logits"],
+        dynamic_axes={"entrada": {0: "lote"}, "logits": {0: "lote"}},
+        opset_version=17,
+    )
+
+    opcoes = onnxruntime.SessionOptions()
+    opcoes.intra_op_num_threads = torch.get_num_threads()
+    sessao = onnxruntime.InferenceSession(
+        caminho, opcoes, providers=["CPUExecutionProvider"]
+    )
+
+    def inferir(entrada: torch.Tensor) -> torch.Tensor:
+        saida = sessao.run(["logits"], {"entrada": entrada.numpy()})[0]
+        return torch.from_numpy(saida)
+
+    return inferir
+
+
+def construir_backend(nome: str, backend: str, modelo, exemplo: torch.Tensor):
+    """Retorna uma função tensor -> logits para o backend pedido."""
+    modelo.eval()
+
+    if backend == "eager":
+        return modelo
+    if backend == "torchscript":
+        with torch.no_grad():
+            rastreado = torch.jit.trace(modelo, exemplo)
+        return torch.jit.freeze(rastreado)
+    if backend == "compile":
+        return torch.compile(modelo)
+    if backend == "int8":
+        return torch.ao.quantization.quantize_dynamic(
+            modelo, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    if backend == "onnx":
+        return _exportar_onnx(nome, modelo, exemplo)
+
+    raise ValueError(f"Backend de inferência desconhecido: {backend}")
+
+
+def medir_divergencia(referencia, candidato, entradas: torch.Tensor) -> float:
+    """Fração das imagens em que a classe prevista muda em relação à referência."""
+    with torch.no_grad():
+        esperado = referencia(entradas).argmax(-1)
+        obtido = candidato(entradas).argmax(-1)
+    return (esperado != obtido).float().mean().item()
+
+
+def selecionar_backend(nome: str, modelo, preprocessar, exemplo: torch.Tensor):
+    """
+    Monta o backend configurado em ML_BACKEND, validando-o contra o conjunto
+    golden. Em qualquer falha volta para o modelo eager.
+    """
+    if ml_backend == "eager":
+        return modelo
+
+    golden = carregar_golden(preprocessar)
+    if golden is None:
+        print(
+            f"[{nome}] Backend {ml_backend} recusado: conjunto golden vazio "
+            f"em {ml_golden_dir}. Usando eager."
+        )
+        return modelo
+
+    try:
+        candidato = construir_backend(nome, ml_backend, modelo, exemplo)
+        divergencia = medir_divergencia(modelo, candidato, golden)
+    except Exception as e:
+        print(f"[{nome}] Erro ao preparar o backend {ml_backend}: {str(e)}. Usando eager.")
+        return modelo
+
+    if divergencia > ml_backend_max_divergencia:
+        print(
+            f"[{nome}] Backend {ml_backend} recusado: divergência de "
+            f"{divergencia:.2%} no conjunto golden (máximo "
+            f"{ml_backend_max_divergencia:.2%}). Usando eager."
+        )
+        return modelo
+
+    print(f"[{nome}] Backend {ml_backend} ativo (divergência {divergencia:.2%}).")
+    return candidato
+
+
+def _latencia_ms(inferir, entrada: torch.Tensor, repeticoes: int) -> float:
+    with torch.no_grad():
+        inferir(entrada)
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            inferir(entrada)
+    return (time.perf_counter() - inicio) * 1000 / repeticoes
+
+
+def comparar_backends(nome: str, modelo, preprocessar, exemplo, repeticoes: int) -> dict:
+    golden = carregar_golden(preprocessar)
+    relatorio = {}
+
+    for backend in BACKENDS:
+        try:
+            inferir = construir_backend(nome, backend, modelo, exemplo)
+        except Exception as e:
+            relatorio[backend] = {"erro": str(e)}
+            continue
+
+        item = {"latencia_ms": round(_latencia_ms(inferir, exemplo, repeticoes), 2)}
+        if golden is not None:
+            item["divergencia"] = medir_divergencia(modelo, inferir, golden)
+            item["aprovado"] = item["divergencia"] <= ml_backend_max_divergencia
+        relatorio[backend] = item
+
+    return relatorio
+
+
+if __name__ == "__main__":
+    from . import machine_learning, detectar_lesao
+    from .modelos import obter_vit, obter_resnet
+
+    parser = argparse.ArgumentParser(
+        description="Compara latência e divergência dos backends de inferência."
+    )
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    _, vit = obter_vit()
+    largura, altura = machine_learning.tamanho_entrada()
+
+    print(
+        json.dumps(
+            {
+                "vit": comparar_backends(
+                    "vit",
+                    SaidaLogits(vit),
+                    machine_learning.preprocessar,
+                    torch.zeros(1, 3, altura, largura),
+                    args.repeticoes,
+                ),
+                "resnet": comparar_backends(
+                    "resnet",
+                    obter_resnet(),
+                    detectar_lesao.preprocessar,
+                    torch.zeros(1, 3, 224, 224),
+                    args.repeticoes,
+                ),
+            },
+            indent=2,
+        )
+    )
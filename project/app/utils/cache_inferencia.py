@@ -0,0 +1,139 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database.database import SessionLocal
+from ..database.models import CacheInferencia
+from .metricas import contador
+from .registro_modelos import versao_ativa
+
+
+ml_cache_ativo = os.getenv("ML_CACHE_ATIVO", "True") == "True"
+# Limites de tamanho (número de entradas) de cada camada
+ml_cache_max_memoria = int(os.getenv("ML_CACHE_MAX_MEMORIA", 1024))
+ml_cache_max_banco = int(os.getenv("ML_CACHE_MAX_BANCO", 100000))
+# A limpeza do banco roda a cada N gravações para não pesar em cada upload
+ml_cache_intervalo_limpeza = int(os.getenv("ML_CACHE_INTERVALO_LIMPEZA", 100))
+
+_memoria = OrderedDict()
+_lock = threading.Lock()
+_gravacoes = 0
+
+_acertos_memoria = contador("cache_inferencia_acertos_memoria")
+_acertos_banco = contador("cache_inferencia_acertos_banco")
+_falhas = contador("cache_inferencia_falhas")
+
+
+def calcular_hash(file_content: bytes) -> str:
+    return hashlib.sha256(file_content).hexdigest()
+
+
+def _buscar_memoria(chave):
+    with _lock:
+        resultado = _memoria.get(chave)
+        if resultado is not None:
+            _memoria.move_to_end(chave)
+        return resultado
+
+
+def _salvar_memoria(chave, resultado: dict):
+    with _lock:
+        _memoria[chave] = resultado
+        _memoria.move_to_end(chave)
+        while len(_memoria) > ml_cache_max_memoria:
+            _memoria.popitem(last=False)
+
+
+async def buscar_resultado(hash_imagem: str):
+    """
+    Retorna o resultado salvo para a imagem (qualidade, diagnóstico e tipo)
+    na versão atual dos modelos, ou None.
+    """
+    if not ml_cache_ativo:
+        return None
+
+    versao = versao_ativa()
+    chave = (hash_imagem, versao)
+    resultado = _buscar_memoria(chave)
+    if resultado is not None:
+        _acertos_memoria.incrementar()
+        return dict(resultado)
+
+    try:
+        async with SessionLocal() as session:
+            stmt = select(CacheInferencia.resultado).filter(
+                CacheInferencia.hash_imagem == hash_imagem,
+                CacheInferencia.versao_modelo == versao,
+            )
+            resultado = (await session.execute(stmt)).scalar_one_or_none()
+
+            if resultado is not None:
+                await session.execute(
+                    update(CacheInferencia)
+                    .filter(
+                        CacheInferencia.hash_imagem == hash_imagem,
+                        CacheInferencia.versao_modelo == versao,
+                    )
+                    .values(ultimo_acesso=func.now())
+                )
+                await session.commit()
+    except Exception as e:
+        # O cache nunca deve impedir a análise da imagem
+        print(f"Erro ao consultar o cache de inferência: {str(e)}")
+        resultado = None
+
+    if resultado is None:
+        _falhas.incrementar()
+        return None
+
+    _acertos_banco.incrementar()
+    _salvar_memoria(chave, resultado)
+    return dict(resultado)
+
+
+async def salvar_resultado(hash_imagem: str, resultado: dict):
+    global _gravacoes
+    if not ml_cache_ativo:
+        return
+
+    # Fica na versão que classificou a imagem, mesmo que outra já esteja ativa
+    versao = resultado.get("versao_modelo") or versao_ativa()
+    _salvar_memoria((hash_imagem, versao), resultado)
+
+    try:
+        async with SessionLocal() as session:
+            stmt = insert(CacheInferencia).values(
+                hash_imagem=hash_imagem,
+                versao_modelo=versao,
+                resultado=resultado,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["hash_imagem", "versao_modelo"],
+                set_={"resultado": resultado, "ultimo_acesso": func.now()},
+            )
+            await session.execute(stmt)
+
+            _gravacoes += 1
+            if _gravacoes % ml_cache_intervalo_limpeza == 0:
+                await _limpar_banco(session)
+
+            await session.commit()
+    except Exception as e:
+        print(f"Erro ao gravar no cache de inferência: {str(e)}")
+
+
+async def _limpar_banco(session):
+    # Mantém apenas as ml_cache_max_banco entradas acessadas mais recentemente
+    corte = (
+        select(CacheInferencia.ultimo_acesso)
+        .order_by(CacheInferencia.ultimo_acesso.desc())
+        .offset(ml_cache_max_banco)
+        .limit(1)
+        .scalar_subquery()
+    )
+    await session.execute(
+        delete(CacheInferencia).filter(CacheInferencia.ultimo_acesso <= corte)
+    )
@@ -0,0 +1,41 @@
+import os
+
+from .metricas import contador
+
+
+# Cascata: pula a ResNet18 quando o ViT já indica o tipo com confiança
+ml_cascata = os.getenv("ML_CASCATA", "False") == "True"
+ml_cascata_confianca = float(os.getenv("ML_CASCATA_CONFIANCA", 0.9))
+
+# Tipo implícito em cada classe do ViT. Ceratose actínica (pré-cancerosa) fica
+# de fora: sempre passa pela ResNet18
+TIPO_POR_CLASSE = {
+    "melanoma": "maligno",
+    "basal_cell_carcinoma": "maligno",
+    "melanocytic_Nevi": "benigno",
+    "benign_keratosis-like_lesions": "benigno",
+    "dermatofibroma": "benigno",
+    "vascular_lesions": "benigno",
+}
+
+resnet_executada = contador("cascata_resnet_executada")
+resnet_pulada = contador("cascata_resnet_pulada")
+
+
+def tipo_implicito(diagnostico: dict):
+    """Tipo da lesão deduzido do ViT, ou None se a ResNet18 precisa rodar."""
+    if ml_cascata:
+        tipo = TIPO_POR_CLASSE.get(diagnostico["classe_original"])
+        if tipo and diagnostico.get("confianca", 0) >= ml_cascata_confianca:
+            return tipo
+    return None
+
+
+def tipo_pela_cascata(diagnostico: dict):
+    """Como tipo_implicito, contando a decisão nas métricas da API."""
+    tipo = tipo_implicito(diagnostico)
+    if tipo is None:
+        resnet_executada.incrementar()
+    else:
+        resnet_pulada.incrementar()
+    return tipo
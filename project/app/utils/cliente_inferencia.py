@@ -0,0 +1,77 @@
+import asyncio
+import json
+import os
+import struct
+from multiprocessing import shared_memory
+from fastapi import HTTPException
+
+from .admissao import erro_sobrecarga
+
+
+# Socket Unix do servidor de inferência (sidecar_inferencia). Vazio: os modelos
+# rodam no próprio processo da API
+ml_sidecar_socket = os.getenv("ML_SIDECAR_SOCKET", "")
+ml_sidecar_timeout = float(os.getenv("ML_SIDECAR_TIMEOUT", 60))
+
+# Cada mensagem é um JSON precedido do tamanho em 4 bytes (big-endian)
+_CABECALHO = struct.Struct(">I")
+
+
+async def enviar_mensagem(writer, mensagem: dict):
+    corpo = json.dumps(mensagem).encode("utf-8")
+    writer.write(_CABECALHO.pack(len(corpo)) + corpo)
+    await writer.drain()
+
+
+async def receber_mensagem(reader) -> dict:
+    tamanho = _CABECALHO.unpack(await reader.readexactly(_CABECALHO.size))[0]
+    return json.loads(await reader.readexactly(tamanho))
+
+
+async def requisitar(mensagem: dict, conteudo: bytes = None) -> dict:
+    """
+    Envia uma requisição ao sidecar. A imagem não passa pelo socket: vai em um
+    bloco de memória compartilhada, do qual o sidecar lê e o cliente remove.
+    """
+    bloco = None
+    writer = None
+    try:
+        if conteudo is not None:
+            bloco = shared_memory.SharedMemory(create=True, size=max(len(conteudo), 1))
+            bloco.buf[: len(conteudo)] = conteudo
+            mensagem = {**mensagem, "memoria": bloco.name, "tamanho": len(conteudo)}
+
+        reader, writer = await asyncio.open_unix_connection(ml_sidecar_socket)
+        await enviar_mensagem(writer, mensagem)
+        resposta = await asyncio.wait_for(
+            receber_mensagem(reader), timeout=ml_sidecar_timeout
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail="Tempo limite excedido ao processar a imagem.",
+        )
+    except (OSError, asyncio.IncompleteReadError) as e:
+        print(f"Erro de comunicação com o servidor de inferência: {str(e)}")
+        raise erro_sobrecarga("Servidor de inferência indisponível.")
+    finally:
+        if writer is not None:
+            writer.close()
+        if bloco is not None:
+            bloco.close()
+            bloco.unlink()
+
+    falha = resposta.get("falha")
+    if falha:
+        if falha["status_code"] == 503:
+            raise erro_sobrecarga(falha["detail"])
+        raise HTTPException(status_code=falha["status_code"], detail=falha["detail"])
+
+    return resposta
+
+
+async def analisar_remoto(file_content: bytes, classificar: bool = True) -> dict:
+    """Qualidade e, se a imagem for boa e `classificar`, diagnóstico e tipo."""
+    return await requisitar(
+        {"operacao": "analisar", "classificar": classificar}, file_content
+    )
@@ -1,33 +1,69 @@
 import torch
-from torchvision import transforms, models
+from torchvision import transforms
 from PIL import Image
-from fastapi import UploadFile
-import io
+from fastapi import UploadFile, HTTPException
 
-# Carrega o modelo completo salvo com torch.save(model)
-model = models.resnet18(weights=None)
-model.fc = torch.nn.Linear(model.fc.in_features, 2)
-
-model.load_state_dict(
-    torch.load("app/utils/data/skin_cancer_resnet18_version1.pt", map_location="cpu")
+from .executor_inferencia import executar
+from .imagem import (
+    TAMANHO_ENTRADA_MODELOS,
+    decodificar_imagem,
+    FILTRO_RESNET,
+    redimensionar_para_modelo,
 )
-model.eval()
+from .modelos import configurar_threads_torch
+from .registro_modelos import obter_versao
+from .backends_inferencia import selecionar_backend
 
-# transformação da imagem
-transform = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor()])
+configurar_threads_torch()
 
+# transformação da imagem (o resize para 224x224 é feito por redimensionar_para_modelo)
+transform = transforms.ToTensor()
+
+
+def preprocessar(imagem: Image.Image) -> torch.Tensor:
+    return transform(redimensionar_para_modelo(imagem, (224, 224), FILTRO_RESNET))
+
+
+def inferir_tipo_lesao(entrada) -> str:
+    if isinstance(entrada, torch.Tensor):
+        input_tensor = entrada.unsqueeze(0)
+    else:
+        input_tensor = preprocessar(
+            decodificar_imagem(entrada, TAMANHO_ENTRADA_MODELOS)
+        ).unsqueeze(0)
+
+    return inferir_tipos_lote([input_tensor[0]])[0]
 
-async def classificar_tipo_lesao(file_content: bytes) -> str:
-    try:
-        imagem = Image.open(io.BytesIO(file_content)).convert("RGB")
-        input_tensor = transform(imagem).unsqueeze(0)
 
-        with torch.no_grad():
-            output = model(input_tensor)
-            pred = torch.argmax(output, dim=1).item()
+def construir_inferencia(model):
+    """Função tensor -> logits no backend configurado (ML_BACKEND)."""
+    return selecionar_backend("resnet", model, preprocessar, torch.zeros(1, 3, 224, 224))
 
-        return "benigno" if pred == 0 else "maligno"
 
+def obter_inferencia():
+    return obter_versao().inferir_resnet
+
+
+def inferir_tipos_lote(tensores: list, versao=None) -> list:
+    # Com `versao`, roda na mesma versão já usada pelo ViT para estas imagens
+    inferir = versao.inferir_resnet if versao is not None else obter_inferencia()
+
+    with torch.no_grad():
+        output = inferir(torch.stack(tensores))
+        preds = torch.argmax(output, dim=1).tolist()
+
+    return ["benigno" if pred == 0 else "maligno" for pred in preds]
+
+
+async def classificar_tipo_lesao(file_content) -> str:
+    """
+    Aceita os bytes da imagem ou o tensor já preparado por
+    `pipeline_imagem.preparar_imagem` (chave "resnet").
+    """
+    try:
+        return await executar(inferir_tipo_lesao, file_content)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"Erro ao classificar a imagem: {str(e)}")
         return "Erro ao classificar a imagem"
@@ -0,0 +1,66 @@
+import os
+import time
+from fastapi import HTTPException
+
+from .executor_limitado import ExecutorLimitado
+from .metricas import contador, histograma
+
+
+# O SDK do MinIO é síncrono: as chamadas rodam neste pool, fora do event loop
+minio_threads = int(os.getenv("MINIO_THREADS", 8))
+# Máximo de operações aguardando ou em execução no pool
+minio_max_fila = int(os.getenv("MINIO_MAX_FILA", 64))
+# Tempo máximo (s) de cada operação, incluindo a espera na fila do pool
+minio_timeout = float(os.getenv("MINIO_TIMEOUT", 120))
+
+LIMITES_LATENCIA_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+executor = ExecutorLimitado(
+    "armazenamento",
+    "thread",
+    minio_threads,
+    minio_max_fila,
+    minio_timeout,
+    mensagem_sobrecarga="Armazenamento sobrecarregado. Tente novamente em instantes.",
+    mensagem_timeout="Tempo limite excedido ao acessar o armazenamento.",
+)
+
+_espera = histograma("armazenamento_espera_ms", LIMITES_LATENCIA_MS)
+_erros = contador("armazenamento_erros")
+_timeouts = contador("armazenamento_timeouts")
+_rejeitadas = contador("armazenamento_rejeitadas")
+
+
+def encerrar_armazenamento():
+    executor.encerrar()
+
+
+async def executar_armazenamento(operacao: str, func, *args):
+    """
+    Executa `func(*args)` (chamadas ao MinIO) no pool de armazenamento sem
+    bloquear o event loop. A latência de cada operação fica no histograma
+    armazenamento_<operacao>_ms; a espera na fila, em armazenamento_espera_ms.
+    """
+    latencia = histograma(f"armazenamento_{operacao}_ms", LIMITES_LATENCIA_MS)
+    enfileirado = time.perf_counter()
+
+    def medir():
+        inicio = time.perf_counter()
+        _espera.observar((inicio - enfileirado) * 1000)
+        try:
+            return func(*args)
+        except Exception:
+            _erros.incrementar()
+            raise
+        finally:
+            latencia.observar((time.perf_counter() - inicio) * 1000)
+
+    try:
+        return await executor.executar(medir)
+    except HTTPException as e:
+        # Recusa (fila cheia) ou timeout do próprio pool
+        if e.status_code == 503:
+            _rejeitadas.incrementar()
+        elif e.status_code == 504:
+            _timeouts.incrementar()
+        raise e
@@ -0,0 +1,47 @@
+import os
+
+from .executor_limitado import ExecutorLimitado
+
+
+# "thread" ou "process"
+ml_executor_tipo = os.getenv("ML_EXECUTOR", "thread")
+ml_executor_workers = int(os.getenv("ML_EXECUTOR_WORKERS", 1))
+# Máximo de tarefas aguardando ou em execução no pool
+ml_executor_max_fila = int(os.getenv("ML_EXECUTOR_MAX_FILA", 32))
+# Tempo máximo (s) de cada tarefa, incluindo a espera na fila do pool
+ml_executor_timeout = float(os.getenv("ML_EXECUTOR_TIMEOUT", 60))
+
+executor = ExecutorLimitado(
+    "inferencia",
+    ml_executor_tipo,
+    ml_executor_workers,
+    ml_executor_max_fila,
+    ml_executor_timeout,
+    mensagem_sobrecarga=(
+        "Servidor de inferência sobrecarregado. Tente novamente em instantes."
+    ),
+    mensagem_timeout="Tempo limite excedido ao processar a imagem.",
+)
+
+
+def encerrar_executor():
+    executor.encerrar()
+
+
+async def executar(func, *args):
+    """
+    Executa `func(*args)` no pool de inferência sem bloquear o event loop.
+
+    Em modo "process", `func` e os argumentos precisam ser serializáveis
+    (funções de nível de módulo).
+    """
+    return await executor.executar(func, *args)
+
+
+async def executar_sem_limite(func, *args):
+    """
+    Executa `func(*args)` no pool sem vaga na fila nem timeout. Para o
+    aquecimento dos modelos, que num pod de 1 CPU (ou com torch.compile,
+    exportação ONNX e conjunto golden) pode passar de ML_EXECUTOR_TIMEOUT.
+    """
+    return await executor.executar_sem_limite(func, *args)
@@ -0,0 +1,110 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+
+from .admissao import erro_sobrecarga
+
+
+class ExecutorLimitado:
+    """
+    Pool de threads ou de processos ("thread" ou "process") com fila limitada,
+    criado no primeiro uso.
+
+    `executar` roda `func(*args)` no pool sem bloquear o event loop: com
+    `max_fila` tarefas aguardando ou em execução responde 503 com Retry-After
+    e, passado `timeout` (s), 504. A vaga só é liberada quando a tarefa
+    realmente termina no pool, mesmo que o chamador já tenha desistido.
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        tipo: str,
+        workers: int,
+        max_fila: int,
+        timeout: float = None,
+        mensagem_sobrecarga: str = "Servidor sobrecarregado.",
+        mensagem_timeout: str = "Tempo limite excedido.",
+        initializer=None,
+    ):
+        self.nome = nome
+        self.tipo = tipo
+        self.workers = max(1, workers)
+        self.max_fila = max_fila
+        self.timeout = timeout
+        self.mensagem_sobrecarga = mensagem_sobrecarga
+        self.mensagem_timeout = mensagem_timeout
+        self.initializer = initializer
+        self._pool = None
+        self._pendentes = 0
+        self._lock = threading.Lock()
+
+    def obter_pool(self):
+        with self._lock:
+            if self._pool is None:
+                if self.tipo == "process":
+                    # spawn evita herdar o estado de threads do PyTorch via fork
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=self.initializer,
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix=self.nome,
+                        initializer=self.initializer,
+                    )
+            return self._pool
+
+    def encerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _reservar_vaga(self) -> bool:
+        with self._lock:
+            if self._pendentes >= self.max_fila:
+                return False
+            self._pendentes += 1
+            return True
+
+    def _liberar_vaga(self, _=None):
+        with self._lock:
+            self._pendentes -= 1
+
+    def submeter(self, func, *args):
+        """Envia ao pool se houver vaga; retorna o future, ou None com a fila cheia."""
+        if not self._reservar_vaga():
+            return None
+
+        try:
+            futuro = self.obter_pool().submit(func, *args)
+        except Exception:
+            self._liberar_vaga()
+            raise
+
+        futuro.add_done_callback(self._liberar_vaga)
+        return futuro
+
+    async def executar(self, func, *args):
+        """
+        Em modo "process", `func` e os argumentos precisam ser serializáveis
+        (funções de nível de módulo).
+        """
+        futuro = self.submeter(func, *args)
+        if futuro is None:
+            raise erro_sobrecarga(self.mensagem_sobrecarga)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(futuro), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            futuro.cancel()
+            raise HTTPException(status_code=504, detail=self.mensagem_timeout)
+
+    async def executar_sem_limite(self, func, *args):
+        """Executa no pool sem ocupar vaga na fila e sem timeout."""
+        return await asyncio.wrap_future(self.obter_pool().submit(func, *args))
@@ -0,0 +1,63 @@
+from PIL import Image
+import io
+import math
+import os
+
+
+# Tamanho de entrada (largura, altura) dos classificadores
+TAMANHO_ENTRADA_MODELOS = (224, 224)
+
+# Filtros de redimensionamento de cada classificador, os mesmos do código
+# original: o ViT recebia imagem.resize((224, 224)) (BICUBIC no Pillow 9.5) e a
+# ResNet18, transforms.Resize (BILINEAR)
+FILTRO_VIT = Image.BICUBIC
+FILTRO_RESNET = Image.BILINEAR
+
+# Imagens acima disso são recusadas antes da decodificação (bomba de descompressão)
+ml_imagem_max_pixels = int(os.getenv("ML_IMAGEM_MAX_PIXELS", 50_000_000))
+
+# Maior lado (px) da imagem usada na avaliação de qualidade. Uma foto de
+# 12 MP em float32 ocupa ~150 MB; reduzida para 1024 px, menos de 10 MB
+ml_qualidade_lado_max = int(os.getenv("ML_QUALIDADE_LADO_MAX", 1024))
+# Liga a redução a ML_QUALIDADE_LADO_MAX e o pré-filtro. Desligado, o BRISQUE
+# roda na resolução original: só ligar depois de benchmarks/validar_qualidade.py
+# passar num conjunto de fotos reais
+ml_qualidade_reduzida = os.getenv("ML_QUALIDADE_REDUZIDA", "False") == "True"
+
+
+def decodificar_imagem(
+    file_content: bytes, tamanho_minimo=None, lado_minimo: int = None
+) -> Image.Image:
+    """
+    Decodifica a imagem em RGB. Em JPEGs, `tamanho_minimo` (largura, altura)
+    e `lado_minimo` (maior lado) permitem decodificar direto em escala
+    reduzida (1/2, 1/4 ou 1/8, no domínio DCT), sem ficar abaixo de nenhum
+    dos dois.
+    """
+    imagem = Image.open(io.BytesIO(file_content))
+
+    largura, altura = imagem.size
+    if largura * altura > ml_imagem_max_pixels:
+        raise Image.DecompressionBombError(
+            f"A imagem tem {largura}x{altura} pixels, acima do limite de "
+            f"{ml_imagem_max_pixels} pixels."
+        )
+
+    if imagem.format == "JPEG" and (tamanho_minimo or lado_minimo):
+        minimo_largura, minimo_altura = tamanho_minimo or (1, 1)
+        if lado_minimo:
+            escala = min(1, lado_minimo / max(largura, altura))
+            minimo_largura = max(minimo_largura, math.ceil(largura * escala))
+            minimo_altura = max(minimo_altura, math.ceil(altura * escala))
+        imagem.draft("RGB", (minimo_largura, minimo_altura))
+
+    return imagem.convert("RGB")
+
+
+def redimensionar_para_modelo(
+    imagem: Image.Image, tamanho, filtro
+) -> Image.Image:
+    # `filtro`: FILTRO_VIT ou FILTRO_RESNET (mudar o filtro muda as predições)
+    if imagem.size == tuple(tamanho):
+        return imagem
+    return imagem.resize(tamanho, filtro)
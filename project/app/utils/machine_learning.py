@@ -1,52 +1,152 @@
-from transformers import AutoImageProcessor, AutoModelForImageClassification
 from PIL import Image
 import torch
-import io
 import json
 import os
-from fastapi import UploadFile
+from fastapi import UploadFile, HTTPException
 
-# Carrega modelo
-processor = AutoImageProcessor.from_pretrained(
-    "Anwarkh1/Skin_Cancer-Image_Classification"
-)
-model = AutoModelForImageClassification.from_pretrained(
-    "Anwarkh1/Skin_Cancer-Image_Classification"
-)
+from .micro_batching import MicroBatcher
+from .executor_inferencia import executar, ml_executor_workers
+from .imagem import FILTRO_VIT, decodificar_imagem, redimensionar_para_modelo
+from .modelos import configurar_threads_torch
+from .registro_modelos import obter_versao
+from .backends_inferencia import SaidaLogits, selecionar_backend
+from .cascata import tipo_implicito
+from . import detectar_lesao
+
+configurar_threads_torch()
 
 # Carrega o JSON uma única vez
 caminho_json = os.path.join(os.path.dirname(__file__), "data", "lesoes.json")
 with open(caminho_json, "r", encoding="utf-8") as f:
     descricoes_lesoes = json.load(f)
 
+# Micro-batching: tamanho máximo do lote e espera máxima pelo lote (ms)
+ml_lote_max = int(os.getenv("ML_LOTE_MAX", 8))
+ml_lote_espera_ms = float(os.getenv("ML_LOTE_ESPERA_MS", 10))
+# Temperatura de calibração do softmax do ViT (ajustada em validação)
+ml_vit_temperatura = float(os.getenv("ML_VIT_TEMPERATURA", 1.0))
 
-async def classificar_imagem_pele(file_content: bytes) -> dict:
-    try:
-        imagem = Image.open(io.BytesIO(file_content)).convert("RGB")
-        imagem = imagem.resize((224, 224))
-        inputs = processor(images=imagem, return_tensors="pt", padding=True)
-
-        with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits
-            predicted_class_idx = logits.argmax(-1).item()
-
-        predicted_label = model.config.id2label[predicted_class_idx]
-
-        # Busca no JSON
-        info = descricoes_lesoes.get(
-            predicted_label,
-            {
-                "nome": "Desconhecido",
-                "descricao": "Não foi possível encontrar uma descrição para esta classificação.",
-            },
+
+def descrever_classe(predicted_label: str) -> dict:
+    # Busca no JSON
+    info = descricoes_lesoes.get(
+        predicted_label,
+        {
+            "nome": "Desconhecido",
+            "descricao": "Não foi possível encontrar uma descrição para esta classificação.",
+        },
+    )
+
+    return {
+        "classe_original": predicted_label,
+        "nome_traduzido": info["nome"],
+        "descricao": info["descricao"],
+    }
+
+
+def tamanho_entrada(processor=None) -> tuple:
+    # Tamanho (largura, altura) esperado pelo ViT
+    processor = processor or obter_versao().processor
+    return (processor.size["width"], processor.size["height"])
+
+
+def preprocessar(imagem: Image.Image, processor=None) -> torch.Tensor:
+    processor = processor or obter_versao().processor
+    # A imagem já chega no tamanho do modelo: evita um segundo resize no processor
+    imagem = redimensionar_para_modelo(imagem, tamanho_entrada(processor), FILTRO_VIT)
+    inputs = processor(images=imagem, do_resize=False, return_tensors="pt")
+    return inputs["pixel_values"][0]
+
+
+def construir_inferencia(processor, model):
+    """Função pixel_values -> logits no backend configurado (ML_BACKEND)."""
+    largura, altura = tamanho_entrada(processor)
+    return selecionar_backend(
+        "vit",
+        SaidaLogits(model),
+        lambda imagem: preprocessar(imagem, processor),
+        torch.zeros(1, 3, altura, largura),
+    )
+
+
+def obter_inferencia():
+    return obter_versao().inferir_vit
+
+
+def classificar_lote(
+    pixel_values: list, tensores_resnet: list = None, versao=None
+) -> list:
+    """
+    Classifica o lote no ViT. Para os itens com tensor em `tensores_resnet` que
+    a cascata não dispensa, a ResNet18 roda em seguida e o tipo vem na chave
+    "tipo": ViT e ResNet18 de uma imagem sempre usam a mesma versão.
+    """
+    # O lote inteiro roda na versão ativa no início, mesmo que ela seja trocada
+    versao = versao or obter_versao()
+
+    with torch.no_grad():
+        logits = versao.inferir_vit(torch.stack(pixel_values))
+        probabilidades = torch.softmax(logits / ml_vit_temperatura, dim=-1)
+        confiancas, predicted_idxs = probabilidades.max(-1)
+
+    resultados = []
+    for idx, confianca in zip(predicted_idxs.tolist(), confiancas.tolist()):
+        resultado = descrever_classe(versao.vit.config.id2label[idx])
+        resultado["confianca"] = round(confianca, 4)
+        resultado["versao_modelo"] = versao.identificador
+        resultados.append(resultado)
+
+    indices = [
+        indice
+        for indice, tensor in enumerate(tensores_resnet or [])
+        if tensor is not None and tipo_implicito(resultados[indice]) is None
+    ]
+    if indices:
+        tipos = detectar_lesao.inferir_tipos_lote(
+            [tensores_resnet[indice] for indice in indices], versao
         )
+        for indice, tipo in zip(indices, tipos):
+            resultados[indice]["tipo"] = tipo
+    return resultados
 
-        return {
-            "classe_original": predicted_label,
-            "nome_traduzido": info["nome"],
-            "descricao": info["descricao"],
-        }
+
+def preparar_entrada(file_content: bytes) -> torch.Tensor:
+    return preprocessar(decodificar_imagem(file_content, tamanho_entrada()))
+
+
+async def _processar_lote(itens: list) -> list:
+    return await executar(
+        classificar_lote,
+        [pixel_values for pixel_values, _ in itens],
+        [tensor_resnet for _, tensor_resnet in itens],
+    )
+
+
+# Um lote em execução por worker do pool de inferência
+batcher = MicroBatcher(
+    "classificador_pele",
+    _processar_lote,
+    ml_lote_max,
+    ml_lote_espera_ms,
+    max_em_execucao=ml_executor_workers,
+)
+
+
+async def classificar_imagem_pele(file_content, tensor_resnet=None) -> dict:
+    """
+    Aceita os bytes da imagem ou o tensor já preparado por
+    `pipeline_imagem.preparar_imagem` (chave "vit"). Com `tensor_resnet`
+    (chave "resnet"), o tipo da ResNet18 vem em "tipo", salvo na cascata.
+    """
+    try:
+        if isinstance(file_content, torch.Tensor):
+            pixel_values = file_content
+        else:
+            pixel_values = await executar(preparar_entrada, file_content)
+
+        return await batcher.submeter((pixel_values, tensor_resnet))
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"Erro ao classificar a imagem: {str(e)}")
         return {
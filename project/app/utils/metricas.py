@@ -0,0 +1,68 @@
+import threading
+from bisect import bisect_left
+
+
+_lock = threading.Lock()
+_metricas = {}
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = sorted(limites)
+        # Um balde extra para valores acima do último limite (+Inf)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float):
+        indice = bisect_left(self.limites, valor)
+        with self._lock:
+            self.contagens[indice] += 1
+            self.soma += valor
+            self.total += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            baldes = {str(limite): c for limite, c in zip(self.limites, self.contagens)}
+            baldes["+Inf"] = self.contagens[-1]
+            return {
+                "tipo": "histograma",
+                "baldes": baldes,
+                "soma": round(self.soma, 4),
+                "total": self.total,
+            }
+
+
+class Contador:
+    def __init__(self):
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def incrementar(self, quantidade: int = 1):
+        with self._lock:
+            self.valor += quantidade
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"tipo": "contador", "valor": self.valor}
+
+
+def histograma(nome: str, limites) -> Histograma:
+    with _lock:
+        if nome not in _metricas:
+            _metricas[nome] = Histograma(limites)
+        return _metricas[nome]
+
+
+def contador(nome: str) -> Contador:
+    with _lock:
+        if nome not in _metricas:
+            _metricas[nome] = Contador()
+        return _metricas[nome]
+
+
+def coletar_metricas() -> dict:
+    with _lock:
+        itens = list(_metricas.items())
+    return {nome: metrica.snapshot() for nome, metrica in sorted(itens)}
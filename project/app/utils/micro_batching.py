@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+from .metricas import histograma
+
+
+LIMITES_TAMANHO_LOTE = [1, 2, 4, 8, 16, 32, 64]
+LIMITES_ESPERA_MS = [1, 2, 5, 10, 20, 50, 100, 250, 500, 1000]
+
+
+class MicroBatcher:
+    """
+    Agrupa requisições concorrentes em lotes para uma única inferência.
+
+    Cada chamada a `submeter` entra em uma fila; um worker coleta itens até
+    atingir `max_lote` ou até `max_espera_ms` após o primeiro item do lote,
+    executa `processar_lote` uma única vez e resolve o future de cada chamador
+    com o resultado correspondente (na mesma ordem da lista de entrada).
+
+    Até `max_em_execucao` lotes rodam ao mesmo tempo (um por worker do pool de
+    inferência); com todos ocupados, os itens se acumulam no próximo lote.
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        processar_lote,
+        max_lote: int,
+        max_espera_ms: float,
+        max_em_execucao: int = 1,
+    ):
+        self.nome = nome
+        self.processar_lote = processar_lote
+        self.max_lote = max(1, max_lote)
+        self.max_espera = max(0.0, max_espera_ms) / 1000
+        self.max_em_execucao = max(1, max_em_execucao)
+        self._fila = None
+        self._vagas = None
+        self._worker = None
+        self._loop = None
+        # Referências aos lotes em execução (evita que sejam coletados)
+        self._lotes = set()
+        self._hist_tamanho = histograma(f"{nome}_tamanho_lote", LIMITES_TAMANHO_LOTE)
+        self._hist_espera = histograma(f"{nome}_espera_fila_ms", LIMITES_ESPERA_MS)
+
+    def _garantir_worker(self):
+        loop = asyncio.get_running_loop()
+        # A fila e o worker pertencem ao event loop em que foram criados
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            if self._loop is not loop:
+                self._fila = asyncio.Queue()
+                self._vagas = asyncio.Semaphore(self.max_em_execucao)
+                self._loop = loop
+            self._worker = loop.create_task(self._executar())
+
+    async def submeter(self, item):
+        self._garantir_worker()
+        futuro = self._loop.create_future()
+        await self._fila.put((item, futuro, time.perf_counter()))
+        return await futuro
+
+    async def _coletar_lote(self) -> list:
+        lote = [await self._fila.get()]
+        prazo = time.perf_counter() + self.max_espera
+
+        while len(lote) < self.max_lote:
+            restante = prazo - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(self._fila.get(), restante))
+            except asyncio.TimeoutError:
+                break
+
+        # Aproveita o que já estiver na fila sem esperar mais
+        while len(lote) < self.max_lote and not self._fila.empty():
+            lote.append(self._fila.get_nowait())
+
+        return lote
+
+    async def _executar(self):
+        while True:
+            # Só coleta o próximo lote quando há vaga para executá-lo
+            await self._vagas.acquire()
+            try:
+                lote = await self._coletar_lote()
+            except BaseException:
+                self._vagas.release()
+                raise
+
+            # Descarta chamadores que desistiram (timeout/cancelamento)
+            lote = [entrada for entrada in lote if not entrada[1].done()]
+            if not lote:
+                self._vagas.release()
+                continue
+
+            agora = time.perf_counter()
+            self._hist_tamanho.observar(len(lote))
+            for _, _, enfileirado_em in lote:
+                self._hist_espera.observar((agora - enfileirado_em) * 1000)
+
+            tarefa = self._loop.create_task(self._processar(lote))
+            self._lotes.add(tarefa)
+            tarefa.add_done_callback(self._lotes.discard)
+
+    async def _processar(self, lote: list):
+        try:
+            itens = [item for item, _, _ in lote]
+            try:
+                resultados = await self.processar_lote(itens)
+            except Exception as e:
+                for _, futuro, _ in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                return
+
+            for (_, futuro, _), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+        finally:
+            self._vagas.release()
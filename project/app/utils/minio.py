@@ -1,80 +1,292 @@
+import asyncio
 import os
 import io
+import hashlib
+import socket
+import threading
 import uuid
 from datetime import datetime, timedelta
 from fastapi import HTTPException
+import certifi
 import minio
+import urllib3
 from minio import Minio
 from minio.error import S3Error
 
+from .executor_armazenamento import executar_armazenamento
+
+
+# Conexões mantidas abertas por host; acima disso as extras são descartadas
+minio_pool_conexoes = int(os.getenv("MINIO_POOL_CONEXOES", 10))
+minio_timeout_conexao = float(os.getenv("MINIO_TIMEOUT_CONEXAO", 5))
+minio_timeout_leitura = float(os.getenv("MINIO_TIMEOUT_LEITURA", 60))
+# Novas tentativas em falhas de conexão e respostas 5xx
+minio_tentativas = int(os.getenv("MINIO_TENTATIVAS", 3))
+minio_tentativas_espera = float(os.getenv("MINIO_TENTATIVAS_ESPERA", 0.2))
+# Tamanho das partes do upload em streaming (mínimo do S3: 5 MiB)
+minio_tamanho_parte = int(os.getenv("MINIO_TAMANHO_PARTE_MB", 5)) * 1024 * 1024
+# Uploads simultâneos de uma mesma requisição (ex.: as fotos de uma lesão)
+minio_uploads_simultaneos = int(os.getenv("MINIO_UPLOADS_SIMULTANEOS", 3))
+
+# Upload direto (URL pré-assinada): endereço do MinIO visto pelos clientes. A
+# assinatura inclui o host, então a URL é gerada com esse endereço
+minio_endpoint_publico = os.getenv("MINIO_ENDPOINT_PUBLICO") or os.getenv("MINIO_ENDPOINT")
+minio_secure_publico = (
+    os.getenv("MINIO_SECURE_PUBLICO") or os.getenv("MINIO_SECURE")
+) == "True"
+# Com a região definida, gerar a URL não consulta o MinIO
+minio_regiao = os.getenv("MINIO_REGIAO", "us-east-1")
+minio_url_expiracao = int(os.getenv("MINIO_URL_EXPIRACAO", 900))
+
+_client = None
+_client_publico = None
+_bucket_pronto = False
+_lock = threading.Lock()
+
+
+def _criar_http_client():
+    return urllib3.PoolManager(
+        num_pools=1,
+        maxsize=minio_pool_conexoes,
+        timeout=urllib3.Timeout(
+            connect=minio_timeout_conexao, read=minio_timeout_leitura
+        ),
+        retries=urllib3.Retry(
+            total=minio_tentativas,
+            backoff_factor=minio_tentativas_espera,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        # Keep-alive do TCP: conexões ociosas do pool não são derrubadas em silêncio
+        socket_options=urllib3.connection.HTTPConnection.default_socket_options
+        + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)],
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.getenv("SSL_CERT_FILE") or certifi.where(),
+    )
+
 
 def get_minio_client():
+    """
+    Cliente único por processo: as conexões do pool são reaproveitadas entre
+    os uploads em vez de um handshake TCP/TLS novo a cada requisição.
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _lock:
+        if _client is None:
+            try:
+                endpoint = os.getenv("MINIO_ENDPOINT")
+                access_key = os.getenv("MINIO_ACCESS_KEY")
+                secret_key = os.getenv("MINIO_SECRET_KEY")
+                minio_secure = os.getenv("MINIO_SECURE") == "True"
+
+                _client = Minio(
+                    endpoint=endpoint,
+                    access_key=access_key,
+                    secret_key=secret_key,
+                    secure=minio_secure,
+                    http_client=_criar_http_client(),
+                )
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500, detail=f"Erro ao conectar ao MinIO: {str(e)}"
+                )
+    return _client
+
+
+def garantir_bucket(client, minio_bucket):
+    """Verifica (e cria, se necessário) o bucket uma única vez por processo."""
+    global _bucket_pronto
+    if _bucket_pronto:
+        return
+
+    with _lock:
+        if not _bucket_pronto:
+            if not client.bucket_exists(minio_bucket):
+                client.make_bucket(minio_bucket)
+                # Configurar políticas do bucket se necessário
+            _bucket_pronto = True
+
+
+def iniciar_minio():
+    """Cria o cliente e prepara o bucket na inicialização da aplicação."""
     try:
-        endpoint = os.getenv("MINIO_ENDPOINT")
-        access_key = os.getenv("MINIO_ACCESS_KEY")
-        secret_key = os.getenv("MINIO_SECRET_KEY")
-        minio_secure = os.getenv("MINIO_SECURE") == "True"
-
-        return Minio(
-            endpoint=endpoint,
-            access_key=access_key,
-            secret_key=secret_key,
-            secure=minio_secure,
-        )
+        garantir_bucket(get_minio_client(), os.getenv("MINIO_BUCKET"))
+        print("Cliente do MinIO iniciado.")
     except Exception as e:
+        # Tenta de novo no primeiro upload
+        print(f"Erro ao iniciar o MinIO: {str(getattr(e, 'detail', e))}")
+
+
+def _validar_tipo(content_type, allowed_types):
+    if allowed_types and content_type not in allowed_types:
         raise HTTPException(
-            status_code=500, detail=f"Erro ao conectar ao MinIO: {str(e)}"
+            status_code=400,
+            detail=f"Tipo de arquivo não permitido. Tipos aceitos: {', '.join(allowed_types)}",
         )
 
 
-async def upload_to_minio(file, folder_name, allowed_types=None, max_size_mb=50):
-    try:
-        minio_bucket = os.getenv("MINIO_BUCKET")
-        client = get_minio_client()
+def _erro_tamanho(max_size_mb):
+    return HTTPException(
+        status_code=400,
+        detail=f"Arquivo muito grande. Tamanho máximo: {max_size_mb}MB",
+    )
 
-        # Validação de tipo de arquivo
-        if allowed_types and file.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Tipo de arquivo não permitido. Tipos aceitos: {', '.join(allowed_types)}",
-            )
 
-        # Lendo os dados do arquivo
-        file_data = await file.read()
-        file_size = len(file_data)
+def gerar_nome_objeto(folder_name, filename):
+    # Gera um nome único para o objeto usando UUID
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    unique_id = uuid.uuid4().hex[:8]
+    file_extension = os.path.splitext(filename)[1]
+    return f"{folder_name}/{folder_name}_{timestamp}_{unique_id}{file_extension}"
 
-        # Validação de tamanho
-        max_size_bytes = max_size_mb * 1024 * 1024
-        if file_size > max_size_bytes:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Arquivo muito grande. Tamanho máximo: {max_size_mb}MB",
-            )
 
-        # Verifica se o bucket existe, caso contrário cria
-        if not client.bucket_exists(minio_bucket):
-            client.make_bucket(minio_bucket)
-            # Configurar políticas do bucket se necessário
-
-        # Gera um nome único para o objeto usando UUID
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        unique_id = uuid.uuid4().hex[:8]
-        file_extension = os.path.splitext(file.filename)[1]
-        object_name = (
-            f"{folder_name}/{folder_name}_{timestamp}_{unique_id}{file_extension}"
-        )
+class ArquivoMuitoGrande(Exception):
+    pass
 
-        # Upload para o MinIO
+
+class LeitorVerificado:
+    """
+    Envolve o arquivo do upload: conta os bytes e calcula o SHA-256 à medida
+    que o MinIO lê as partes, e interrompe a leitura acima do limite.
+    """
+
+    def __init__(self, arquivo, limite):
+        self.arquivo = arquivo
+        self.limite = limite
+        self.tamanho = 0
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        dados = self.arquivo.read(size)
+        self.tamanho += len(dados)
+        if self.tamanho > self.limite:
+            raise ArquivoMuitoGrande()
+        self.sha256.update(dados)
+        return dados
+
+
+def _enviar_arquivo(arquivo, object_name, content_type, max_size_bytes):
+    # Executada no pool de armazenamento
+    minio_bucket = os.getenv("MINIO_BUCKET")
+    client = get_minio_client()
+    garantir_bucket(client, minio_bucket)
+
+    arquivo.seek(0)
+    leitor = LeitorVerificado(arquivo, max_size_bytes)
+    try:
         client.put_object(
             bucket_name=minio_bucket,
             object_name=object_name,
-            data=io.BytesIO(file_data),
-            length=file_size,
-            content_type=file.content_type,
+            data=leitor,
+            length=-1,
+            part_size=minio_tamanho_parte,
+            content_type=content_type,
+            # Partes enviadas uma a uma nesta thread: com o padrão (3) o SDK lê
+            # partes à frente para as suas threads, que continuam vivas se o
+            # upload for abortado
+            num_parallel_uploads=1,
         )
+    finally:
+        # Volta ao início só depois da última leitura, nesta mesma thread:
+        # após um timeout o chamador já desistiu, mas o PUT continua lendo
+        arquivo.seek(0)
+    return leitor
+
+
+def _enviar_bytes(file_data, object_name, content_type):
+    # Executada no pool de armazenamento
+    minio_bucket = os.getenv("MINIO_BUCKET")
+    client = get_minio_client()
+    garantir_bucket(client, minio_bucket)
+
+    client.put_object(
+        bucket_name=minio_bucket,
+        object_name=object_name,
+        data=io.BytesIO(file_data),
+        length=len(file_data),
+        content_type=content_type,
+    )
+
+
+async def upload_to_minio(file, folder_name, allowed_types=None, max_size_mb=50):
+    """
+    Envia o UploadFile ao MinIO lendo direto do arquivo temporário do upload,
+    em partes de MINIO_TAMANHO_PARTE_MB: só uma parte fica em memória. Arquivos
+    menores que uma parte vão em um único PUT. A transferência roda no pool de
+    armazenamento (executor_armazenamento), fora do event loop.
+
+    O ponteiro do arquivo volta ao início quando a transferência termina no
+    pool (_enviar_arquivo), mesmo que esta chamada já tenha respondido 504.
+    """
+    try:
+        _validar_tipo(file.content_type, allowed_types)
+
+        # Recusa antes de transferir quando o tamanho já é conhecido
+        max_size_bytes = max_size_mb * 1024 * 1024
+        if file.size is not None and file.size > max_size_bytes:
+            raise _erro_tamanho(max_size_mb)
+
+        object_name = gerar_nome_objeto(folder_name, file.filename)
+        leitor = await executar_armazenamento(
+            "upload",
+            _enviar_arquivo,
+            file.file,
+            object_name,
+            file.content_type,
+            max_size_bytes,
+        )
+
+        return {
+            "url": object_name,
+            "tamanho": leitor.tamanho,
+            "sha256": leitor.sha256.hexdigest(),
+        }
+
+    except ArquivoMuitoGrande:
+        # O SDK já abortou o upload multipart em andamento
+        raise _erro_tamanho(max_size_mb)
+    except S3Error as e:
+        raise HTTPException(status_code=500, detail=f"Erro no MinIO: {str(e)}")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao fazer upload: {str(e)}")
+
+
+def agendar_uploads(files, folder_name, allowed_types=None, max_size_mb=50) -> list:
+    """
+    Inicia o upload de cada arquivo em uma tarefa, no máximo
+    MINIO_UPLOADS_SIMULTANEOS por vez. As tarefas voltam na ordem dos arquivos;
+    quem as cria deve aguardá-las ou cancelá-las.
+    """
+    limite = asyncio.Semaphore(minio_uploads_simultaneos)
 
-        # Reposiciona o ponteiro do arquivo para o início (caso precise usar novamente)
-        await file.seek(0)
+    async def enviar(file):
+        async with limite:
+            return await upload_to_minio(file, folder_name, allowed_types, max_size_mb)
+
+    return [asyncio.create_task(enviar(file)) for file in files]
+
+
+async def upload_bytes_to_minio(
+    file_data, filename, content_type, folder_name, allowed_types=None, max_size_mb=50
+):
+    try:
+        # Validação de tipo de arquivo
+        _validar_tipo(content_type, allowed_types)
+
+        # Validação de tamanho
+        if len(file_data) > max_size_mb * 1024 * 1024:
+            raise _erro_tamanho(max_size_mb)
+
+        object_name = gerar_nome_objeto(folder_name, filename)
+
+        # Upload para o MinIO
+        await executar_armazenamento(
+            "upload", _enviar_bytes, file_data, object_name, content_type
+        )
 
         return {"url": object_name}
 
@@ -84,3 +296,118 @@ async def upload_to_minio(file, folder_name, allowed_types=None, max_size_mb=50)
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao fazer upload: {str(e)}")
+
+
+def get_minio_client_publico():
+    """Cliente usado só para assinar URLs com o endereço público do MinIO."""
+    global _client_publico
+    with _lock:
+        if _client_publico is None:
+            _client_publico = Minio(
+                endpoint=minio_endpoint_publico,
+                access_key=os.getenv("MINIO_ACCESS_KEY"),
+                secret_key=os.getenv("MINIO_SECRET_KEY"),
+                secure=minio_secure_publico,
+                region=minio_regiao,
+            )
+    return _client_publico
+
+
+def gerar_url_upload(object_name):
+    """
+    URL pré-assinada para o cliente enviar o arquivo direto ao MinIO (PUT).
+    Calculada localmente, sem requisição ao MinIO.
+    """
+    try:
+        return get_minio_client_publico().presigned_put_object(
+            os.getenv("MINIO_BUCKET"),
+            object_name,
+            expires=timedelta(seconds=minio_url_expiracao),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar URL de upload: {str(e)}")
+
+
+def _remover_objeto(object_name):
+    # Executada no pool de armazenamento
+    get_minio_client().remove_object(os.getenv("MINIO_BUCKET"), object_name)
+
+
+def _verificar_objeto(object_name, allowed_types, max_size_mb, md5):
+    # Executada no pool de armazenamento
+    client = get_minio_client()
+    minio_bucket = os.getenv("MINIO_BUCKET")
+    try:
+        stat = client.stat_object(minio_bucket, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            raise HTTPException(status_code=404, detail="Arquivo não encontrado no armazenamento")
+        raise
+
+    erro = None
+    if stat.size > max_size_mb * 1024 * 1024:
+        erro = _erro_tamanho(max_size_mb)
+    elif allowed_types and stat.content_type not in allowed_types:
+        erro = HTTPException(
+            status_code=400,
+            detail=f"Tipo de arquivo não permitido. Tipos aceitos: {', '.join(allowed_types)}",
+        )
+    # Em um PUT único (caso da URL pré-assinada) o ETag é o MD5 do conteúdo
+    elif (stat.etag or "").lower() != md5.lower():
+        erro = HTTPException(
+            status_code=400,
+            detail="O checksum (MD5) do arquivo enviado não confere.",
+        )
+
+    if erro is not None:
+        # O objeto recusado não fica órfão no bucket
+        client.remove_object(minio_bucket, object_name)
+        raise erro
+
+    return {"url": object_name, "tamanho": stat.size, "content_type": stat.content_type}
+
+
+async def verificar_objeto(object_name, md5, allowed_types=None, max_size_mb=50):
+    """
+    Confere tamanho, tipo e MD5 de um arquivo enviado por URL pré-assinada.
+    Só os metadados são consultados: os bytes não passam pela API.
+    """
+    try:
+        return await executar_armazenamento(
+            "verificacao", _verificar_objeto, object_name, allowed_types, max_size_mb, md5
+        )
+    except S3Error as e:
+        raise HTTPException(status_code=500, detail=f"Erro no MinIO: {str(e)}")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao verificar o arquivo: {str(e)}")
+
+
+def _baixar_objeto(object_name):
+    # Executada no pool de armazenamento
+    resposta = get_minio_client().get_object(os.getenv("MINIO_BUCKET"), object_name)
+    try:
+        return resposta.read()
+    finally:
+        resposta.close()
+        resposta.release_conn()
+
+
+async def download_bytes_from_minio(object_name):
+    try:
+        return await executar_armazenamento("download", _baixar_objeto, object_name)
+    except S3Error as e:
+        raise HTTPException(status_code=500, detail=f"Erro no MinIO: {str(e)}")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao baixar o arquivo: {str(e)}")
+
+
+async def remove_from_minio(object_name):
+    try:
+        await executar_armazenamento("remocao", _remover_objeto, object_name)
+    except Exception as e:
+        # Só deixa um objeto órfão no bucket
+        print(f"Erro ao remover {object_name} do MinIO: {str(getattr(e, 'detail', e))}")
@@ -0,0 +1,228 @@
+import os
+import threading
+
+from .recursos import cpus_disponiveis
+
+# torch, torchvision e transformers só são importados ao carregar os modelos:
+# com ML_SIDECAR_SOCKET o processo da API nunca os importa
+
+
+ml_modelos_dir = os.getenv("ML_MODELOS_DIR", "app/utils/data")
+ml_vit_modelo = os.getenv("ML_VIT_MODELO", "Anwarkh1/Skin_Cancer-Image_Classification")
+# Em modo offline nada é baixado: os pesos vêm de ML_MODELOS_DIR (ou do cache do HF)
+ml_offline = os.getenv("ML_OFFLINE", "True") == "True"
+
+caminho_vit = os.path.join(ml_modelos_dir, "skin_cancer_vit")
+caminho_resnet = os.path.join(ml_modelos_dir, "skin_cancer_resnet18_version1.pt")
+
+# Identifica os pesos da versão padrão (ver registro_modelos)
+ml_versao_modelos = os.getenv("ML_VERSAO_MODELOS") or (
+    f"{ml_vit_modelo}+{os.path.basename(caminho_resnet)}"
+)
+
+
+_torch_configurado = False
+
+
+def threads_torch() -> int:
+    """Threads intra-op de cada processo que executa inferências."""
+    # Threads do pool de inferência em cada worker do servidor (gunicorn)
+    workers = int(os.getenv("ML_EXECUTOR_WORKERS", 1)) * int(
+        os.getenv("ML_SERVIDOR_WORKERS", 1)
+    )
+    return int(os.getenv("ML_TORCH_THREADS") or max(1, cpus_disponiveis() // workers))
+
+
+def configurar_threads_torch():
+    """
+    Sem configuração o PyTorch usa uma thread por núcleo do host, o que
+    sobrecarrega pods de 1 CPU quando há várias inferências simultâneas.
+    Chamada pelos módulos que importam o torch, antes da primeira inferência.
+    """
+    global _torch_configurado
+    if _torch_configurado:
+        return
+    _torch_configurado = True
+
+    import torch
+
+    inter = int(os.getenv("ML_TORCH_INTEROP_THREADS") or 1)
+
+    torch.set_num_threads(threads_torch())
+    try:
+        torch.set_num_interop_threads(inter)
+    except RuntimeError:
+        # Só pode ser definido antes do primeiro uso do pool inter-op
+        pass
+
+
+_lock = threading.Lock()
+_vit = None
+_resnet = None
+
+# Estado do aquecimento no processo da API (consultado por /ready)
+estado = {"pronto": False, "erro": None}
+
+
+def _origem_vit() -> str:
+    if os.path.isdir(caminho_vit):
+        return caminho_vit
+    return ml_vit_modelo
+
+
+def carregar_vit(origem: str):
+    """Retorna (processor, model) de um checkpoint do ViT (diretório ou id do HF)."""
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    configurar_threads_torch()
+    # safetensors é lido via mmap pelo transformers
+    processor = AutoImageProcessor.from_pretrained(origem, local_files_only=ml_offline)
+    model = AutoModelForImageClassification.from_pretrained(
+        origem, local_files_only=ml_offline
+    )
+    model.eval()
+    print(f"Modelo ViT carregado de {origem}.")
+    return processor, model
+
+
+def carregar_resnet(caminho: str):
+    import torch
+    from torchvision import models
+
+    configurar_threads_torch()
+    model = models.resnet18(weights=None)
+    model.fc = torch.nn.Linear(model.fc.in_features, 2)
+
+    # mmap + assign: os tensores apontam para o arquivo em vez de
+    # serem copiados para memória anônima
+    state_dict = torch.load(caminho, map_location="cpu", mmap=True, weights_only=True)
+    model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    print(f"Modelo ResNet18 carregado de {caminho}.")
+    return model
+
+
+def obter_vit():
+    """Retorna (processor, model) do ViT, carregando na primeira chamada."""
+    global _vit
+    if _vit is None:
+        with _lock:
+            if _vit is None:
+                _vit = carregar_vit(_origem_vit())
+    return _vit
+
+
+def obter_resnet():
+    global _resnet
+    if _resnet is None:
+        with _lock:
+            if _resnet is None:
+                _resnet = carregar_resnet(caminho_resnet)
+    return _resnet
+
+
+MODULOS_ML = (
+    "app.utils.machine_learning",
+    "app.utils.detectar_lesao",
+    "app.utils.qualidade_imagem",
+    "app.utils.pipeline_imagem",
+)
+
+
+def importar_modulos_ml():
+    import importlib
+
+    for modulo in MODULOS_ML:
+        importlib.import_module(modulo)
+
+
+async def garantir_modulos_ml():
+    """
+    Importa a pilha de ML (torch, transformers, piq) fora do event loop. Chamada
+    antes dos imports locais nas rotas: a primeira requisição não trava o loop
+    importando torch, nem espera atrás do aquecimento segurando o loop.
+    """
+    import sys
+    import asyncio
+
+    if all(modulo in sys.modules for modulo in MODULOS_ML):
+        return
+    await asyncio.to_thread(importar_modulos_ml)
+
+
+def aquecer() -> bool:
+    """Carrega os modelos e executa uma inferência de aquecimento em cada um."""
+    import torch
+    from piq import brisque
+    from . import machine_learning, detectar_lesao
+
+    # Monta (e valida) também o backend configurado em ML_BACKEND
+    inferir_vit = machine_learning.obter_inferencia()
+    inferir_resnet = detectar_lesao.obter_inferencia()
+
+    with torch.no_grad():
+        largura, altura = machine_learning.tamanho_entrada()
+        inferir_vit(torch.zeros(1, 3, altura, largura))
+        inferir_resnet(torch.zeros(1, 3, 224, 224))
+        # Também garante que os pesos do SVM do BRISQUE estão no cache local
+        brisque(torch.rand(1, 3, 64, 64))
+
+    return True
+
+
+async def aguardar_sidecar():
+    """Com ML_SIDECAR_SOCKET, a API fica pronta quando o sidecar estiver pronto."""
+    import asyncio
+    from fastapi import HTTPException
+    from .cliente_inferencia import requisitar
+    from .registro_modelos import definir_versao_remota
+
+    while True:
+        try:
+            resposta = await requisitar({"operacao": "pronto"})
+            if resposta["pronto"] or resposta["erro"]:
+                definir_versao_remota(resposta.get("versao_modelo"))
+                estado["erro"] = resposta["erro"]
+                estado["pronto"] = resposta["pronto"]
+                return
+        except HTTPException:
+            # Sidecar ainda não está ouvindo no socket
+            pass
+        await asyncio.sleep(1)
+
+
+async def iniciar_aquecimento():
+    from .executor_inferencia import executar_sem_limite
+    from .cliente_inferencia import ml_sidecar_socket
+
+    if ml_sidecar_socket:
+        await aguardar_sidecar()
+        return
+
+    try:
+        # Roda no pool de inferência para aquecer o mesmo worker que atende as
+        # rotas, sem o timeout das inferências: /ready só responde ao fim
+        estado["pronto"] = await executar_sem_limite(aquecer)
+        print("Modelos carregados e aquecidos.")
+    except Exception as e:
+        estado["erro"] = str(getattr(e, "detail", e))
+        print(f"Erro ao aquecer os modelos: {estado['erro']}")
+
+
+def baixar_modelos():
+    """Salva o ViT em ML_MODELOS_DIR para uso offline (executado no build)."""
+    import torch
+    from piq import brisque
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    processor = AutoImageProcessor.from_pretrained(ml_vit_modelo)
+    model = AutoModelForImageClassification.from_pretrained(ml_vit_modelo)
+    processor.save_pretrained(caminho_vit)
+    model.save_pretrained(caminho_vit, safe_serialization=True)
+
+    brisque(torch.rand(1, 3, 64, 64))
+    print(f"Modelos salvos em {caminho_vit}.")
+
+
+if __name__ == "__main__":
+    baixar_modelos()
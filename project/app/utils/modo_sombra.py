@@ -0,0 +1,185 @@
+"""
+Modo sombra: roda um modelo candidato em uma amostra das imagens enviadas e
+grava as predições em PredicaoSombra, ao lado das de produção, sem afetar a
+resposta ao usuário.
+
+Configuração:
+    ML_SOMBRA_VIT: checkpoint candidato do ViT (diretório ou id do HF)
+    ML_SOMBRA_RESNET: arquivo .pt candidato da ResNet18
+    ML_SOMBRA_AMOSTRA: fração das imagens avaliadas (0 desativa)
+
+O candidato roda em um único processo separado, com uma thread do PyTorch e
+prioridade mínima (nice). A fila é limitada: quando o processo está ocupado,
+a imagem é descartada da amostra em vez de esperar.
+"""
+
+import asyncio
+import os
+import random
+import time
+
+from .executor_limitado import ExecutorLimitado
+from .metricas import contador, histograma
+
+ml_sombra_vit = os.getenv("ML_SOMBRA_VIT", "")
+ml_sombra_resnet = os.getenv("ML_SOMBRA_RESNET", "")
+ml_sombra_amostra = float(os.getenv("ML_SOMBRA_AMOSTRA", 0.0))
+ml_sombra_max_fila = int(os.getenv("ML_SOMBRA_MAX_FILA", 4))
+ml_sombra_nice = int(os.getenv("ML_SOMBRA_NICE", 19))
+ml_sombra_versao = os.getenv("ML_SOMBRA_VERSAO") or (
+    f"{ml_sombra_vit or '-'}+{os.path.basename(ml_sombra_resnet) or '-'}"
+)
+
+LIMITES_LATENCIA_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+# Referências às tarefas em andamento (evita que sejam coletadas)
+_tarefas = set()
+
+_executadas = contador("sombra_executadas")
+_descartadas = contador("sombra_descartadas")
+_latencia = histograma("sombra_latencia_ms", LIMITES_LATENCIA_MS)
+
+# Modelos candidatos, carregados no processo sombra
+_candidatos = None
+
+
+def sombra_ativa() -> bool:
+    return ml_sombra_amostra > 0 and bool(ml_sombra_vit or ml_sombra_resnet)
+
+
+def _inicializar_processo():
+    # Uma thread e prioridade mínima: o candidato só usa CPU ociosa
+    os.environ["ML_TORCH_THREADS"] = "1"
+    os.environ["ML_TORCH_INTEROP_THREADS"] = "1"
+    try:
+        os.nice(ml_sombra_nice)
+    except OSError:
+        pass
+
+
+def _obter_candidatos():
+    global _candidatos
+    if _candidatos is None:
+        from .modelos import carregar_vit, carregar_resnet
+
+        _candidatos = {
+            "vit": carregar_vit(ml_sombra_vit) if ml_sombra_vit else None,
+            "resnet": carregar_resnet(ml_sombra_resnet) if ml_sombra_resnet else None,
+        }
+    return _candidatos
+
+
+def classificar_candidato(file_content: bytes) -> dict:
+    """Executado no processo sombra."""
+    import torch
+    from . import detectar_lesao
+    from .imagem import (
+        TAMANHO_ENTRADA_MODELOS,
+        FILTRO_VIT,
+        decodificar_imagem,
+        redimensionar_para_modelo,
+    )
+    from .machine_learning import ml_vit_temperatura
+
+    candidatos = _obter_candidatos()
+    inicio = time.perf_counter()
+    imagem = decodificar_imagem(file_content, TAMANHO_ENTRADA_MODELOS)
+    resultado = {"classe_original": None, "confianca": None, "tipo_lesao": None}
+
+    with torch.no_grad():
+        if candidatos["vit"] is not None:
+            processor, model = candidatos["vit"]
+            tamanho = (processor.size["width"], processor.size["height"])
+            entrada = processor(
+                images=redimensionar_para_modelo(imagem, tamanho, FILTRO_VIT),
+                do_resize=False,
+                return_tensors="pt",
+            )["pixel_values"]
+            logits = model(pixel_values=entrada).logits
+            confianca, idx = torch.softmax(logits / ml_vit_temperatura, dim=-1).max(-1)
+            resultado["classe_original"] = model.config.id2label[idx.item()]
+            resultado["confianca"] = round(confianca.item(), 4)
+
+        if candidatos["resnet"] is not None:
+            entrada = detectar_lesao.preprocessar(imagem).unsqueeze(0)
+            pred = candidatos["resnet"](entrada).argmax(1).item()
+            resultado["tipo_lesao"] = "benigno" if pred == 0 else "maligno"
+
+    resultado["latencia_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+    return resultado
+
+
+executor = ExecutorLimitado(
+    "sombra", "process", 1, ml_sombra_max_fila, initializer=_inicializar_processo
+)
+
+
+def encerrar_sombra():
+    executor.encerrar()
+
+
+async def _gravar(registro_lesoes_imagens_id: int, futuro, producao: dict):
+    from ..database import models
+    from ..database.database import SessionLocal
+
+    try:
+        candidato = await asyncio.wrap_future(futuro)
+    except Exception as e:
+        print(f"Erro no modelo sombra: {str(e)}")
+        return
+
+    _executadas.incrementar()
+    _latencia.observar(candidato["latencia_ms"])
+
+    classe_producao = producao.get("diagnostico", {}).get("classe_original")
+    tipo_producao = producao.get("tipo")
+
+    def concorda(valor_candidato, valor_producao):
+        if valor_candidato is None or valor_producao is None:
+            return None
+        return valor_candidato == valor_producao
+
+    try:
+        async with SessionLocal() as db:
+            db.add(
+                models.PredicaoSombra(
+                    registro_lesoes_imagens_id=registro_lesoes_imagens_id,
+                    versao_modelo=ml_sombra_versao,
+                    classe_original=candidato["classe_original"],
+                    confianca=candidato["confianca"],
+                    tipo_lesao=candidato["tipo_lesao"],
+                    classe_producao=classe_producao,
+                    tipo_producao=tipo_producao,
+                    concorda_classe=concorda(candidato["classe_original"], classe_producao),
+                    concorda_tipo=concorda(candidato["tipo_lesao"], tipo_producao),
+                    latencia_ms=candidato["latencia_ms"],
+                )
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"Erro ao gravar predição sombra: {str(e)}")
+
+
+def agendar_sombra(registro_lesoes_imagens_id: int, file_content: bytes, producao: dict):
+    """
+    Sorteia a imagem para a amostra e, se houver vaga, envia ao candidato.
+    Nunca espera nem lança exceção: o chamador segue sem custo adicional.
+    """
+    if not sombra_ativa() or random.random() >= ml_sombra_amostra:
+        return
+
+    try:
+        futuro = executor.submeter(classificar_candidato, file_content)
+    except Exception as e:
+        print(f"Erro ao agendar o modelo sombra: {str(e)}")
+        return
+
+    if futuro is None:
+        _descartadas.incrementar()
+        return
+
+    tarefa = asyncio.get_running_loop().create_task(
+        _gravar(registro_lesoes_imagens_id, futuro, producao)
+    )
+    _tarefas.add(tarefa)
+    tarefa.add_done_callback(_tarefas.discard)
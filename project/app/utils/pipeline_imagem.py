@@ -0,0 +1,45 @@
+from . import machine_learning, detectar_lesao, qualidade_imagem
+from .executor_inferencia import executar
+from .imagem import (
+    FILTRO_RESNET,
+    FILTRO_VIT,
+    decodificar_imagem,
+    redimensionar_para_modelo,
+)
+
+
+def preparar_imagem_sync(file_content: bytes, com_qualidade: bool = True) -> dict:
+    """
+    Decodifica a imagem uma única vez e gera as entradas dos três consumidores:
+    "qualidade" (BRISQUE), "vit" (classificar_imagem_pele) e
+    "resnet" (classificar_tipo_lesao).
+    """
+    largura_vit, altura_vit = machine_learning.tamanho_entrada()
+    tamanho_minimo = (max(largura_vit, 224), max(altura_vit, 224))
+    lado_minimo = None
+    if com_qualidade:
+        if qualidade_imagem.ml_qualidade_reduzida:
+            # A decodificação reduzida não pode ficar abaixo do limite da qualidade
+            lado_minimo = qualidade_imagem.ml_qualidade_lado_max
+        else:
+            # BRISQUE na resolução original: sem decodificação reduzida
+            tamanho_minimo = None
+
+    imagem = decodificar_imagem(file_content, tamanho_minimo, lado_minimo)
+
+    # Um resize por modelo: cada um usa o filtro com que sempre foi alimentado
+    imagem_vit = redimensionar_para_modelo(imagem, (largura_vit, altura_vit), FILTRO_VIT)
+    imagem_resnet = redimensionar_para_modelo(imagem, (224, 224), FILTRO_RESNET)
+
+    entradas = {
+        "vit": machine_learning.preprocessar(imagem_vit),
+        "resnet": detectar_lesao.preprocessar(imagem_resnet),
+    }
+    if com_qualidade:
+        entradas["qualidade"] = qualidade_imagem.preprocessar(imagem)
+
+    return entradas
+
+
+async def preparar_imagem(file_content: bytes) -> dict:
+    return await executar(preparar_imagem_sync, file_content)
@@ -1,18 +1,93 @@
+import os
 import torch
 import numpy as np
 from PIL import Image, UnidentifiedImageError
 from piq import brisque
-import io
+from fastapi import HTTPException
 
+from .executor_inferencia import executar
+from .imagem import decodificar_imagem, ml_qualidade_lado_max, ml_qualidade_reduzida
+from .modelos import configurar_threads_torch
 
-def avaliar_qualidade_imagem(image_data: bytes) -> dict:
-    try:
-        img = Image.open(io.BytesIO(image_data)).convert("RGB")
+configurar_threads_torch()
+
+
+IMAGEM_INVALIDA = {
+    "erro": "A imagem fornecida está corrompida ou em formato inválido.",
+    "score": None,
+    "qualidade": "erro",
+}
+
+
+# Pré-filtro: variância mínima do Laplaciano (escala 0-255) e fração máxima
+# de pixels estourados ou totalmente escuros
+ml_qualidade_variancia_min = float(os.getenv("ML_QUALIDADE_VARIANCIA_MIN", 10))
+ml_qualidade_max_saturados = float(os.getenv("ML_QUALIDADE_MAX_SATURADOS", 0.6))
+
+
+def reduzir_imagem(img: Image.Image) -> Image.Image:
+    if not ml_qualidade_reduzida:
+        return img
+    largura, altura = img.size
+    escala = ml_qualidade_lado_max / max(largura, altura)
+    if escala >= 1:
+        return img
+    novo_tamanho = (max(1, round(largura * escala)), max(1, round(altura * escala)))
+    return img.resize(novo_tamanho, Image.LANCZOS)
+
+
+def preprocessar(img: Image.Image) -> torch.Tensor:
+    img_array = np.asarray(reduzir_imagem(img), dtype=np.float32) / 255.0
+
+    return torch.from_numpy(img_array).permute(2, 0, 1).unsqueeze(0)
+
+
+def prefiltrar(img_tensor: torch.Tensor):
+    """
+    Recusa fotos obviamente ruins (desfocadas ou com exposição errada) sem
+    rodar o BRISQUE. Retorna o resultado da recusa ou None.
+    """
+    r, g, b = img_tensor[0].numpy()
+    cinza = (0.299 * r + 0.587 * g + 0.114 * b) * 255.0
+
+    laplaciano = (
+        cinza[:-2, 1:-1]
+        + cinza[2:, 1:-1]
+        + cinza[1:-1, :-2]
+        + cinza[1:-1, 2:]
+        - 4 * cinza[1:-1, 1:-1]
+    )
+    if laplaciano.var() < ml_qualidade_variancia_min:
+        return {
+            "erro": "A imagem está desfocada.",
+            "score": None,
+            "qualidade": "péssima",
+        }
+
+    histograma = np.histogram(cinza, bins=256, range=(0, 256))[0]
+    saturados = (histograma[:8].sum() + histograma[-8:].sum()) / cinza.size
+    if saturados > ml_qualidade_max_saturados:
+        return {
+            "erro": "A imagem está muito escura ou muito clara.",
+            "score": None,
+            "qualidade": "péssima",
+        }
 
-        img_array = np.array(img).astype(np.float32) / 255.0
+    return None
 
-        img_tensor = torch.tensor(img_array).permute(2, 0, 1).unsqueeze(0)
 
+def classificar_score(brisque_score: float) -> str:
+    # Limites calibrados na resolução original; a concordância com a imagem
+    # reduzida é verificada por benchmarks/validar_qualidade.py
+    if brisque_score < 25:
+        return "boa"
+    elif 20 <= brisque_score < 50:
+        return "ruim"
+    return "péssima"
+
+
+def calcular_qualidade_tensor(img_tensor: torch.Tensor) -> dict:
+    try:
         if img_tensor.shape[2] < 50 or img_tensor.shape[3] < 50:
             return {
                 "erro": "A imagem é muito pequena para avaliação de qualidade.",
@@ -20,21 +95,43 @@ def avaliar_qualidade_imagem(image_data: bytes) -> dict:
                 "qualidade": "erro",
             }
 
-        brisque_score = brisque(img_tensor).item()
+        if ml_qualidade_reduzida:
+            rejeicao = prefiltrar(img_tensor)
+            if rejeicao is not None:
+                return rejeicao
 
-        if brisque_score < 25:
-            qualidade = "boa"
-        elif 20 <= brisque_score < 50:
-            qualidade = "ruim"
-        else:
-            qualidade = "péssima"
+        brisque_score = brisque(img_tensor).item()
 
-        return {"score": round(brisque_score, 2), "qualidade": qualidade}
-    except UnidentifiedImageError:
         return {
-            "erro": "A imagem fornecida está corrompida ou em formato inválido.",
-            "score": None,
-            "qualidade": "erro",
+            "score": round(brisque_score, 2),
+            "qualidade": classificar_score(brisque_score),
         }
     except Exception as e:
         return {"erro": str(e), "score": None, "qualidade": "erro"}
+
+
+def calcular_qualidade_imagem(image_data: bytes) -> dict:
+    try:
+        lado_minimo = ml_qualidade_lado_max if ml_qualidade_reduzida else None
+        img = decodificar_imagem(image_data, lado_minimo=lado_minimo)
+    except UnidentifiedImageError:
+        return dict(IMAGEM_INVALIDA)
+    except Exception as e:
+        return {"erro": str(e), "score": None, "qualidade": "erro"}
+
+    return calcular_qualidade_tensor(preprocessar(img))
+
+
+async def avaliar_qualidade_imagem(image_data) -> dict:
+    """
+    Aceita os bytes da imagem ou o tensor já preparado por
+    `pipeline_imagem.preparar_imagem` (chave "qualidade").
+    """
+    try:
+        if isinstance(image_data, torch.Tensor):
+            return await executar(calcular_qualidade_tensor, image_data)
+        return await executar(calcular_qualidade_imagem, image_data)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        return {"erro": str(e), "score": None, "qualidade": "erro"}
@@ -0,0 +1,276 @@
+"""
+Reclassifica todas as imagens de RegistroLesoesImagens com a versão atual dos
+modelos e grava o resultado em PredicaoImagem.
+
+Uso:
+    poetry run python -m app.utils.reclassificar_imagens [--lote 64]
+        [--workers 2] [--downloads 8] [--checkpoint reclassificacao.json]
+
+O job lê as imagens em ordem de id com um cursor no servidor, baixa o lote
+seguinte do MinIO enquanto o atual é classificado e salva o último id gravado
+no checkpoint, podendo ser interrompido e retomado.
+
+As imagens que não puderam ser baixadas ou classificadas ficam na lista
+"falhas" do checkpoint e são tentadas de novo na próxima execução. Enquanto
+houver falhas o job termina com código de saída 1.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database.database import SessionLocal
+from ..database.models import RegistroLesoesImagens, PredicaoImagem
+from .minio import get_minio_client
+from .registro_modelos import obter_versao, versao_ativa
+from .recursos import cpus_disponiveis
+
+
+def _inicializar_worker(threads: int):
+    # Evita que cada processo do pool use todos os núcleos; lido por
+    # modelos.configurar_threads_torch ao importar os modelos
+    os.environ["ML_TORCH_THREADS"] = str(threads)
+
+
+def classificar_bytes(conteudos: list) -> list:
+    """Executado nos processos do pool: classifica um lote de imagens."""
+    from . import machine_learning, detectar_lesao
+    from .pipeline_imagem import preparar_imagem_sync
+
+    entradas = []
+    validos = []
+    for indice, conteudo in enumerate(conteudos):
+        try:
+            entradas.append(preparar_imagem_sync(conteudo, com_qualidade=False))
+            validos.append(indice)
+        except Exception as e:
+            print(f"Erro ao decodificar imagem: {str(e)}")
+
+    resultados = [None] * len(conteudos)
+    if not entradas:
+        return resultados
+
+    # Uma versão para o lote todo: ViT e ResNet18 nunca ficam em versões diferentes
+    versao = obter_versao()
+    diagnosticos = machine_learning.classificar_lote(
+        [e["vit"] for e in entradas], versao=versao
+    )
+    tipos = detectar_lesao.inferir_tipos_lote([e["resnet"] for e in entradas], versao)
+
+    for indice, diagnostico, tipo in zip(validos, diagnosticos, tipos):
+        resultados[indice] = {"diagnostico": diagnostico, "tipo": tipo}
+    return resultados
+
+
+def _ler_checkpoint(caminho: str) -> dict:
+    progresso = {"ultimo_id": 0, "falhas": []}
+    if not os.path.exists(caminho):
+        return progresso
+
+    with open(caminho, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+
+    # Checkpoint de outra versão dos modelos: recomeça do início
+    if dados.get("versao_modelo") != versao_ativa():
+        return progresso
+
+    progresso["ultimo_id"] = dados.get("ultimo_id", 0)
+    progresso["falhas"] = dados.get("falhas", [])
+    return progresso
+
+
+def _salvar_checkpoint(caminho: str, progresso: dict):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "ultimo_id": progresso["ultimo_id"],
+                "falhas": progresso["falhas"],
+                "versao_modelo": versao_ativa(),
+            },
+            f,
+        )
+    os.replace(temporario, caminho)
+
+
+def _baixar_objeto(client, bucket: str, caminho: str):
+    try:
+        resposta = client.get_object(bucket, caminho)
+        try:
+            return resposta.read()
+        finally:
+            resposta.close()
+            resposta.release_conn()
+    except Exception as e:
+        print(f"Erro ao baixar {caminho} do MinIO: {str(e)}")
+        return None
+
+
+async def _baixar_lote(pool_downloads, client, bucket: str, linhas) -> list:
+    loop = asyncio.get_running_loop()
+    conteudos = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                pool_downloads, _baixar_objeto, client, bucket, arquivo_path
+            )
+            for _, arquivo_path in linhas
+        )
+    )
+    return [(id_imagem, conteudo) for (id_imagem, _), conteudo in zip(linhas, conteudos)]
+
+
+async def _classificar_e_gravar(
+    pool, workers: int, sessao, baixados, progresso: dict, checkpoint: str
+):
+    loop = asyncio.get_running_loop()
+    inicio = time.perf_counter()
+
+    validos = [(id_imagem, c) for id_imagem, c in baixados if c is not None]
+    resultados = []
+    if validos:
+        # Divide o lote entre os processos do pool
+        tamanho = -(-len(validos) // workers)
+        partes = [validos[i : i + tamanho] for i in range(0, len(validos), tamanho)]
+        respostas = await asyncio.gather(
+            *(
+                loop.run_in_executor(pool, classificar_bytes, [c for _, c in parte])
+                for parte in partes
+            )
+        )
+        resultados = [r for resposta in respostas for r in resposta]
+
+    latencia_ms = (time.perf_counter() - inicio) * 1000 / max(len(validos), 1)
+
+    linhas = [
+        {
+            "registro_lesoes_imagens_id": id_imagem,
+            "classe_original": resultado["diagnostico"]["classe_original"],
+            "nome_traduzido": resultado["diagnostico"]["nome_traduzido"],
+            "descricao": resultado["diagnostico"]["descricao"],
+            "tipo_lesao": resultado["tipo"],
+            "versao_modelo": resultado["diagnostico"]["versao_modelo"],
+            "latencia_ms": round(latencia_ms, 2),
+        }
+        for (id_imagem, _), resultado in zip(validos, resultados)
+        if resultado is not None
+    ]
+
+    if linhas:
+        stmt = insert(PredicaoImagem).values(linhas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["registro_lesoes_imagens_id"],
+            set_={
+                coluna: stmt.excluded[coluna]
+                for coluna in (
+                    "classe_original",
+                    "nome_traduzido",
+                    "descricao",
+                    "tipo_lesao",
+                    "versao_modelo",
+                    "latencia_ms",
+                )
+            },
+        )
+        await sessao.execute(stmt)
+        await sessao.commit()
+
+    # Download ou classificação falhou: o id fica no checkpoint para a próxima
+    # execução em vez de ser pulado quando o checkpoint avança
+    ids_lote = {id_imagem for id_imagem, _ in baixados}
+    gravados = {linha["registro_lesoes_imagens_id"] for linha in linhas}
+    progresso["falhas"] = sorted(
+        (set(progresso["falhas"]) - ids_lote) | (ids_lote - gravados)
+    )
+    progresso["ultimo_id"] = max(progresso["ultimo_id"], baixados[-1][0])
+    _salvar_checkpoint(checkpoint, progresso)
+
+    print(
+        f"Lote até a imagem {baixados[-1][0]}: {len(linhas)}/{len(baixados)} "
+        f"imagens reclassificadas."
+    )
+    return len(linhas)
+
+
+async def reclassificar(
+    lote: int, workers: int, downloads: int, checkpoint: str
+) -> list:
+    """Retorna os ids que continuam com falha ao fim da execução."""
+    progresso = _ler_checkpoint(checkpoint)
+    ultimo_id = progresso["ultimo_id"]
+    print(
+        f"Reclassificando imagens a partir do id {ultimo_id} ({versao_ativa()}), "
+        f"com {len(progresso['falhas'])} falhas anteriores."
+    )
+
+    client = get_minio_client()
+    bucket = os.getenv("MINIO_BUCKET")
+    total = 0
+
+    stmt = (
+        select(RegistroLesoesImagens.id, RegistroLesoesImagens.arquivo_path)
+        .filter(
+            or_(
+                RegistroLesoesImagens.id > ultimo_id,
+                RegistroLesoesImagens.id.in_(progresso["falhas"]),
+            )
+        )
+        .order_by(RegistroLesoesImagens.id)
+        .execution_options(yield_per=lote)
+    )
+
+    threads = max(1, cpus_disponiveis() // workers)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_inicializar_worker,
+        initargs=(threads,),
+    ) as pool, ThreadPoolExecutor(max_workers=downloads) as pool_downloads:
+        async with SessionLocal() as leitura, SessionLocal() as escrita:
+            resultado = await leitura.stream(stmt)
+            pendente = None
+
+            async for linhas in resultado.partitions(lote):
+                # Baixa o próximo lote enquanto o anterior é classificado
+                baixados = await _baixar_lote(pool_downloads, client, bucket, linhas)
+                if pendente is not None:
+                    total += await pendente
+                pendente = asyncio.create_task(
+                    _classificar_e_gravar(
+                        pool, workers, escrita, baixados, progresso, checkpoint
+                    )
+                )
+
+            if pendente is not None:
+                total += await pendente
+
+    print(f"Reclassificação concluída: {total} imagens.")
+    if progresso["falhas"]:
+        print(
+            f"{len(progresso['falhas'])} imagens com falha ficaram no checkpoint "
+            f"{checkpoint} e serão tentadas na próxima execução."
+        )
+    return progresso["falhas"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reclassifica as imagens de lesões com a versão atual dos modelos."
+    )
+    parser.add_argument("--lote", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=cpus_disponiveis())
+    parser.add_argument("--downloads", type=int, default=8)
+    parser.add_argument("--checkpoint", default="reclassificacao.json")
+    args = parser.parse_args()
+
+    falhas = asyncio.run(
+        reclassificar(args.lote, args.workers, args.downloads, args.checkpoint)
+    )
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,39 @@
+import os
+import resource
+
+
+def cpus_disponiveis() -> int:
+    """CPUs do container: respeita a cota do cgroup (limits.cpu do k8s)."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            cota, periodo = f.read().split()
+        if cota != "max":
+            return max(1, -(-int(cota) // int(periodo)))
+    except (OSError, ValueError):
+        pass
+    return os.cpu_count() or 1
+
+
+def memoria_processo() -> dict:
+    """
+    Memória do processo atual em MB. "pss" divide as páginas compartilhadas
+    entre os processos que as usam (ex.: pesos herdados do master do gunicorn).
+    """
+    campos = {
+        "Rss": "rss_mb",
+        "Pss": "pss_mb",
+        "Shared_Clean": "compartilhada_mb",
+        "Shared_Dirty": "compartilhada_mb",
+    }
+    try:
+        memoria = {"rss_mb": 0.0, "pss_mb": 0.0, "compartilhada_mb": 0.0}
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for linha in f:
+                nome, _, valor = linha.partition(":")
+                if nome in campos:
+                    memoria[campos[nome]] += int(valor.split()[0]) / 1024
+        return {chave: round(valor, 1) for chave, valor in memoria.items()}
+    except OSError:
+        # Fora do Linux: apenas o pico de RSS
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return {"rss_max_mb": round(pico, 1)}
@@ -0,0 +1,230 @@
+"""
+Registro das versões dos modelos, trocadas sem reiniciar o processo.
+
+Cada versão é um subdiretório de ML_VERSOES_DIR:
+    <ML_VERSOES_DIR>/<versao>/skin_cancer_vit/          (checkpoint do ViT)
+    <ML_VERSOES_DIR>/<versao>/skin_cancer_resnet18.pt   (pesos da ResNet18)
+O componente ausente é o da versão "padrao" (ML_MODELOS_DIR). O nome da versão
+identifica os pesos no cache de inferência e nas predições: pesos novos
+precisam de um nome novo.
+
+A versão ativa é um objeto que nunca é alterado, trocado por uma única
+atribuição. Cada lote obtém a versão uma vez (obter_versao) e a usa até o fim:
+os lotes em andamento terminam na versão antiga, que é liberada quando o último
+deles termina. Durante a troca as duas versões ficam em memória.
+
+A versão escolhida é gravada em ML_VERSOES_DIR/ativa. Os outros processos
+(workers do gunicorn, pool de inferência, reclassificação) a carregam em
+segundo plano e trocam quando ela estiver pronta, sem parar de atender.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from fastapi import HTTPException
+
+from .modelos import ml_modelos_dir, ml_versao_modelos
+
+# Sem torch no topo: versao_ativa() é usada pela API também com o sidecar
+
+
+ml_versoes_dir = os.getenv("ML_VERSOES_DIR", os.path.join(ml_modelos_dir, "versoes"))
+# Versão usada enquanto nenhuma foi ativada pelo endpoint de administração
+ml_versao_inicial = os.getenv("ML_VERSAO_INICIAL", "padrao")
+# Intervalo (s) entre as consultas ao arquivo da versão ativa
+ml_versao_intervalo = float(os.getenv("ML_VERSAO_INTERVALO", 5))
+
+VERSAO_PADRAO = "padrao"
+ARQUIVO_ATIVA = "ativa"
+NOME_VIT = "skin_cancer_vit"
+NOME_RESNET = "skin_cancer_resnet18.pt"
+
+
+def identificador(nome: str) -> str:
+    # A versão padrão mantém a chave antiga: o cache e as predições continuam valendo
+    if nome == VERSAO_PADRAO:
+        return ml_versao_modelos
+    return nome
+
+
+class VersaoModelos:
+    def __init__(self, nome: str, vit, resnet, inferir_vit, inferir_resnet):
+        self.nome = nome
+        self.identificador = identificador(nome)
+        self.processor, self.vit = vit
+        self.resnet = resnet
+        self.inferir_vit = inferir_vit
+        self.inferir_resnet = inferir_resnet
+
+
+_ativa = None
+# Serializa os carregamentos; a inferência nunca espera por ele
+_lock = threading.Lock()
+_ultima_verificacao = 0.0
+_carregando = None
+_falhou = None
+# Com ML_SIDECAR_SOCKET, a versão informada pelo sidecar
+_versao_remota = None
+
+
+def listar_versoes() -> list:
+    versoes = [VERSAO_PADRAO]
+    if os.path.isdir(ml_versoes_dir):
+        versoes += sorted(
+            nome
+            for nome in os.listdir(ml_versoes_dir)
+            if os.path.isdir(os.path.join(ml_versoes_dir, nome))
+        )
+    return versoes
+
+
+def _ler_versao_gravada() -> str:
+    try:
+        with open(os.path.join(ml_versoes_dir, ARQUIVO_ATIVA), encoding="utf-8") as f:
+            return f.read().strip() or ml_versao_inicial
+    except FileNotFoundError:
+        return ml_versao_inicial
+
+
+def _gravar_versao(nome: str):
+    # os.replace é atômico: os outros processos nunca leem o arquivo pela metade
+    caminho = os.path.join(ml_versoes_dir, ARQUIVO_ATIVA)
+    temporario = f"{caminho}.{os.getpid()}"
+    os.makedirs(ml_versoes_dir, exist_ok=True)
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(nome)
+    os.replace(temporario, caminho)
+
+
+def carregar_versao(nome: str) -> VersaoModelos:
+    """Carrega, valida (ML_BACKEND) e aquece os modelos de uma versão."""
+    import torch
+    from . import machine_learning, detectar_lesao
+    from .modelos import carregar_vit, carregar_resnet, obter_vit, obter_resnet
+
+    if nome not in listar_versoes():
+        raise HTTPException(status_code=404, detail=f"Versão de modelos não encontrada: {nome}")
+
+    caminho_vit = os.path.join(ml_versoes_dir, nome, NOME_VIT)
+    caminho_resnet = os.path.join(ml_versoes_dir, nome, NOME_RESNET)
+
+    vit = carregar_vit(caminho_vit) if os.path.isdir(caminho_vit) else obter_vit()
+    resnet = (
+        carregar_resnet(caminho_resnet) if os.path.isfile(caminho_resnet) else obter_resnet()
+    )
+    processor, model = vit
+
+    inferir_vit = machine_learning.construir_inferencia(processor, model)
+    inferir_resnet = detectar_lesao.construir_inferencia(resnet)
+
+    with torch.no_grad():
+        largura, altura = machine_learning.tamanho_entrada(processor)
+        inferir_vit(torch.zeros(1, 3, altura, largura))
+        inferir_resnet(torch.zeros(1, 3, 224, 224))
+
+    print(f"Versão de modelos {nome} carregada.")
+    return VersaoModelos(nome, vit, resnet, inferir_vit, inferir_resnet)
+
+
+def _carregar_em_segundo_plano(nome: str):
+    global _ativa, _carregando, _falhou
+    try:
+        with _lock:
+            if _ativa is None or _ativa.nome != nome:
+                _ativa = carregar_versao(nome)
+    except Exception as e:
+        # Não tenta de novo até que outra versão seja gravada
+        _falhou = nome
+        print(f"Erro ao carregar a versão de modelos {nome}: {str(getattr(e, 'detail', e))}")
+    finally:
+        _carregando = None
+
+
+def _verificar_troca():
+    global _ultima_verificacao, _carregando
+    agora = time.monotonic()
+    if agora - _ultima_verificacao < ml_versao_intervalo:
+        return
+    _ultima_verificacao = agora
+
+    nome = _ler_versao_gravada()
+    if nome in (_ativa.nome, _carregando, _falhou):
+        return
+
+    _carregando = nome
+    threading.Thread(
+        target=_carregar_em_segundo_plano, args=(nome,), daemon=True
+    ).start()
+
+
+def obter_versao() -> VersaoModelos:
+    """Versão ativa; carrega a versão gravada na primeira chamada."""
+    global _ativa
+    if _ativa is None:
+        with _lock:
+            if _ativa is None:
+                _ativa = carregar_versao(_ler_versao_gravada())
+    else:
+        _verificar_troca()
+    return _ativa
+
+
+def ativar_versao(nome: str) -> str:
+    """
+    Carrega a versão e só então a torna ativa neste processo e nos demais.
+    Bloqueante: chamada fora do event loop.
+    """
+    global _ativa, _falhou
+    with _lock:
+        nova = carregar_versao(nome)
+        _gravar_versao(nome)
+        _ativa = nova
+        _falhou = None
+    print(f"Versão de modelos {nome} ativada.")
+    return nova.identificador
+
+
+def definir_versao_remota(versao: str):
+    global _versao_remota
+    if versao:
+        _versao_remota = versao
+
+
+def versao_ativa() -> str:
+    """Identificador da versão ativa, sem carregar os modelos."""
+    if _ativa is not None:
+        _verificar_troca()
+        return _ativa.identificador
+    if _versao_remota is not None:
+        return _versao_remota
+    return identificador(_ler_versao_gravada())
+
+
+async def ativar(nome: str) -> dict:
+    """Ativa a versão onde os modelos rodam: sidecar, pool de processos ou aqui."""
+    from .cliente_inferencia import ml_sidecar_socket, requisitar
+    from .executor_inferencia import ml_executor_tipo, executar_sem_limite
+
+    if ml_sidecar_socket:
+        resposta = await requisitar({"operacao": "ativar_versao", "versao": nome})
+        definir_versao_remota(resposta["versao_modelo"])
+        return resposta
+
+    if ml_executor_tipo == "process":
+        # Um processo do pool carrega e grava; os demais seguem o arquivo. Sem o
+        # timeout nem a fila das inferências: carregar, montar o backend e aquecer
+        # pode passar de ML_EXECUTOR_TIMEOUT, e a troca terminaria mesmo com 504
+        versao = await executar_sem_limite(ativar_versao, nome)
+    else:
+        # Fora do pool de inferência, que continua atendendo na versão antiga
+        versao = await asyncio.to_thread(ativar_versao, nome)
+    return {"versao": nome, "versao_modelo": versao}
+
+
+async def situacao() -> dict:
+    from .cliente_inferencia import ml_sidecar_socket, requisitar
+
+    if ml_sidecar_socket:
+        return await requisitar({"operacao": "versoes"})
+    return {"versao_modelo": versao_ativa(), "versoes": listar_versoes()}
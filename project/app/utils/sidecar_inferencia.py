@@ -0,0 +1,148 @@
+"""
+Servidor de inferência fora do processo da API. Hospeda o ViT
+(machine_learning), a ResNet18 (detectar_lesao) e o BRISQUE
+(qualidade_imagem) e atende a API por um socket Unix.
+
+Uso:
+    poetry run python -m app.utils.sidecar_inferencia
+
+Na API, ML_SIDECAR_SOCKET deve apontar para o mesmo socket; com ele a API não
+importa torch. As imagens são trocadas por memória compartilhada
+(/dev/shm): em containers separados do mesmo pod, os dois precisam montar o
+mesmo volume emptyDir (medium: Memory) em /dev/shm e o diretório do socket.
+
+Operações (JSON com tamanho em 4 bytes, ver cliente_inferencia); erros voltam
+como {"falha": {"status_code": ..., "detail": ...}}:
+    {"operacao": "analisar", "classificar": bool, "memoria": nome, "tamanho": n}
+    {"operacao": "pronto"}
+    {"operacao": "metricas"}
+    {"operacao": "versoes"}
+    {"operacao": "ativar_versao", "versao": nome}
+"""
+
+import asyncio
+import os
+from multiprocessing import resource_tracker, shared_memory
+from fastapi import HTTPException
+from PIL import UnidentifiedImageError
+
+from .cliente_inferencia import ml_sidecar_socket, enviar_mensagem, receber_mensagem
+from .executor_inferencia import executar_sem_limite, encerrar_executor
+from .metricas import coletar_metricas
+from .modelos import aquecer, estado
+from .registro_modelos import versao_ativa, listar_versoes, ativar_versao
+
+
+def falha(status_code: int, detail: str) -> dict:
+    # Repassada pelo cliente como HTTPException
+    return {"falha": {"status_code": status_code, "detail": detail}}
+
+
+def ler_memoria_compartilhada(nome: str, tamanho: int) -> bytes:
+    bloco = shared_memory.SharedMemory(name=nome)
+    try:
+        # O bloco pertence ao cliente: sem isso o resource_tracker deste
+        # processo o removeria ao encerrar
+        resource_tracker.unregister(bloco._name, "shared_memory")
+        return bytes(bloco.buf[:tamanho])
+    finally:
+        bloco.close()
+
+
+async def analisar(conteudo: bytes, classificar: bool) -> dict:
+    from .cascata import tipo_pela_cascata
+    from .machine_learning import classificar_imagem_pele
+    from .pipeline_imagem import preparar_imagem
+    from .qualidade_imagem import avaliar_qualidade_imagem, IMAGEM_INVALIDA
+
+    try:
+        entradas = await preparar_imagem(conteudo)
+        qualidade = await avaliar_qualidade_imagem(entradas.pop("qualidade"))
+    except UnidentifiedImageError:
+        return {"qualidade": dict(IMAGEM_INVALIDA)}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        return {"qualidade": {"erro": str(e), "score": None, "qualidade": "erro"}}
+
+    resultado = {"qualidade": qualidade, "versao_modelo": versao_ativa()}
+    if classificar and qualidade["qualidade"] == "boa":
+        # ResNet18 no mesmo lote e na mesma versão dos modelos do ViT
+        diagnostico = await classificar_imagem_pele(entradas["vit"], entradas["resnet"])
+        tipo = diagnostico.pop("tipo", None)
+        tipo = tipo_pela_cascata(diagnostico) or tipo or "Erro ao classificar a imagem"
+        resultado["diagnostico"] = diagnostico
+        resultado["tipo"] = tipo
+        resultado["versao_modelo"] = (
+            diagnostico.pop("versao_modelo", None) or resultado["versao_modelo"]
+        )
+
+    return resultado
+
+
+async def responder(mensagem: dict) -> dict:
+    operacao = mensagem.get("operacao")
+
+    if operacao == "pronto":
+        return {
+            "pronto": estado["pronto"],
+            "erro": estado["erro"],
+            "versao_modelo": versao_ativa(),
+        }
+    if operacao == "metricas":
+        return coletar_metricas()
+    if operacao == "versoes":
+        return {"versao_modelo": versao_ativa(), "versoes": listar_versoes()}
+    if operacao == "ativar_versao":
+        # Carrega fora do event loop: as análises seguem na versão antiga
+        versao = await asyncio.to_thread(ativar_versao, mensagem["versao"])
+        return {"versao": mensagem["versao"], "versao_modelo": versao}
+    if operacao == "analisar":
+        conteudo = ler_memoria_compartilhada(mensagem["memoria"], mensagem["tamanho"])
+        return await analisar(conteudo, mensagem.get("classificar", True))
+
+    return falha(400, f"Operação desconhecida: {operacao}")
+
+
+async def atender(reader, writer):
+    try:
+        mensagem = await receber_mensagem(reader)
+        try:
+            resposta = await responder(mensagem)
+        except HTTPException as e:
+            resposta = falha(e.status_code, str(e.detail))
+        except Exception as e:
+            print(f"Erro ao atender requisição de inferência: {str(e)}")
+            resposta = falha(500, str(e))
+        await enviar_mensagem(writer, resposta)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def servir(caminho: str):
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+    servidor = await asyncio.start_unix_server(atender, path=caminho)
+    print(f"Servidor de inferência ouvindo em {caminho}.")
+
+    try:
+        # Atende "pronto" enquanto os modelos carregam
+        # Sem o timeout das inferências: a carga inicial pode ser mais longa
+        estado["pronto"] = await executar_sem_limite(aquecer)
+        print("Modelos carregados e aquecidos.")
+    except Exception as e:
+        estado["erro"] = str(getattr(e, "detail", e))
+        print(f"Erro ao aquecer os modelos: {estado['erro']}")
+
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        encerrar_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(servir(ml_sidecar_socket or "/tmp/inferencia.sock"))
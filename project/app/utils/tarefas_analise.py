@@ -0,0 +1,131 @@
+import uuid
+from fastapi import HTTPException
+
+from ..database import models
+from ..database.database import SessionLocal
+from .minio import (
+    upload_bytes_to_minio,
+    download_bytes_from_minio,
+    remove_from_minio,
+)
+from .admissao import admissao_inferencia
+from .modo_sombra import agendar_sombra
+from .analise_lesao import (
+    analisar_qualidade,
+    classificar_analise,
+    criar_predicao,
+    versao_do_resultado,
+)
+
+
+async def criar_tarefa(db, registro_lesoes_id: int, nomes_arquivos: list):
+    tarefa = models.TarefaAnaliseLesao(
+        id=uuid.uuid4().hex,
+        registro_lesoes_id=registro_lesoes_id,
+        status="pendente",
+        resultados=[{"arquivo": nome, "status": "pendente"} for nome in nomes_arquivos],
+    )
+    db.add(tarefa)
+    await db.commit()
+    await db.refresh(tarefa)
+    return tarefa
+
+
+async def _processar_arquivo(
+    db, registro_lesoes_id: int, arquivo: dict, sombras: list
+) -> dict:
+    nome = arquivo["nome"]
+    # Upload direto (URL pré-assinada): o arquivo já está no MinIO
+    arquivo_path = arquivo.get("arquivo_path")
+    try:
+        if arquivo["conteudo"] is None and arquivo_path:
+            arquivo["conteudo"] = await download_bytes_from_minio(arquivo_path)
+
+        analise = await analisar_qualidade(arquivo["conteudo"])
+        qualidade = analise["resultado"]["qualidade"]
+
+        if qualidade["qualidade"] != "boa":
+            if arquivo_path:
+                # Como no upload pela API, imagens rejeitadas não ficam guardadas
+                await remove_from_minio(arquivo_path)
+            return {
+                "arquivo": nome,
+                "status": "rejeitada",
+                "erro": qualidade.get("erro", "Qualidade inferior a boa."),
+                "qualidade": qualidade,
+            }
+
+        if not arquivo_path:
+            arquivo_metadata = await upload_bytes_to_minio(
+                arquivo["conteudo"],
+                nome,
+                arquivo["content_type"],
+                folder_name="imagens-lesoes",
+            )
+            arquivo_path = arquivo_metadata["url"]
+
+        new_imagem = models.RegistroLesoesImagens(
+            arquivo_path=arquivo_path,
+            registro_lesoes_id=registro_lesoes_id,
+        )
+        db.add(new_imagem)
+
+        resultado = await classificar_analise(analise)
+        db.add(criar_predicao(new_imagem, analise))
+        sombras.append((new_imagem, arquivo["conteudo"], resultado))
+
+        return {
+            "arquivo": nome,
+            "status": "concluida",
+            "arquivo_path": arquivo_path,
+            "tipo": resultado["tipo"],
+            "prediagnostico": resultado["diagnostico"]["nome_traduzido"],
+            "descricao_lesao": resultado["diagnostico"]["descricao"],
+            "versao_modelo": versao_do_resultado(resultado),
+            "qualidade": qualidade,
+        }
+    except HTTPException as e:
+        return {"arquivo": nome, "status": "erro", "erro": str(e.detail)}
+    except Exception as e:
+        print(f"Erro ao processar imagem {nome}: {str(e)}")
+        return {"arquivo": nome, "status": "erro", "erro": str(e)}
+
+
+async def processar_tarefa(tarefa_id: str, arquivos: list):
+    """
+    Executada em segundo plano após a resposta 202 de /cadastrar-lesao.
+    `arquivos` é uma lista de dicts com "nome", "content_type" e "conteudo";
+    no upload direto, "conteudo" é None e "arquivo_path" aponta para o MinIO.
+    """
+    async with SessionLocal() as db:
+        tarefa = await db.get(models.TarefaAnaliseLesao, tarefa_id)
+        tarefa.status = "processando"
+        await db.commit()
+
+        try:
+            for indice, arquivo in enumerate(arquivos):
+                sombras = []
+                # Em segundo plano a tarefa espera a vez em vez de ser rejeitada
+                async with admissao_inferencia.admitir(rejeitar=False):
+                    item = await _processar_arquivo(
+                        db, tarefa.registro_lesoes_id, arquivo, sombras
+                    )
+                # Libera os bytes da imagem assim que ela é processada
+                arquivo["conteudo"] = None
+
+                # Nova lista para o SQLAlchemy detectar a alteração na coluna JSON
+                resultados = list(tarefa.resultados)
+                resultados[indice] = item
+                tarefa.resultados = resultados
+                await db.commit()
+
+                for new_imagem, conteudo, resultado in sombras:
+                    agendar_sombra(new_imagem.id, conteudo, resultado)
+
+            tarefa.status = "concluida"
+        except Exception as e:
+            print(f"Erro ao processar a tarefa {tarefa_id}: {str(e)}")
+            await db.rollback()
+            tarefa.status = "erro"
+
+        await db.commit()
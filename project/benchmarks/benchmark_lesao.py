@@ -0,0 +1,181 @@
+"""
+Benchmark das etapas de análise de uma imagem de lesão:
+avaliar_qualidade_imagem, classificar_imagem_pele e classificar_tipo_lesao.
+
+Uso (a partir de project/):
+    poetry run python -m benchmarks.benchmark_lesao
+        [--resolucoes 640x480,1920x1080,4000x3000] [--lotes 1,4,8]
+        [--repeticoes 10] [--saida benchmark.json]
+
+Cada lote envia N imagens ao mesmo tempo (como N uploads simultâneos), o que
+exercita o micro-batching e o pool de inferência. Cada combinação de etapa e
+resolução roda em um processo novo, para que o pico de RSS seja só dela.
+Para comparar backends, rode com ML_BACKEND diferente e compare os JSONs.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+
+import numpy as np
+from PIL import Image
+
+
+ETAPAS = ("qualidade", "classificacao_pele", "tipo_lesao")
+
+
+def gerar_imagem(largura: int, altura: int, semente: int = 0) -> bytes:
+    """JPEG sintético: gradiente suave com ruído, para não comprimir demais."""
+    rng = np.random.default_rng(semente)
+    x, y = np.meshgrid(
+        np.linspace(0, 1, largura, dtype=np.float32),
+        np.linspace(0, 1, altura, dtype=np.float32),
+    )
+    base = np.stack([180 * x + 40 * y, 120 + 60 * y * x, 90 + 50 * x], axis=-1)
+    ruido = rng.normal(0, 12, size=(altura, largura, 3))
+    pixels = np.clip(base + ruido, 0, 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _funcao_da_etapa(etapa: str):
+    if etapa == "qualidade":
+        from app.utils.qualidade_imagem import avaliar_qualidade_imagem
+
+        return avaliar_qualidade_imagem
+    if etapa == "classificacao_pele":
+        from app.utils.machine_learning import classificar_imagem_pele
+
+        return classificar_imagem_pele
+    from app.utils.detectar_lesao import classificar_tipo_lesao
+
+    return classificar_tipo_lesao
+
+
+def _rss_pico_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def _medir_lote(funcao, conteudos: list, repeticoes: int) -> dict:
+    latencias = []
+
+    async def medir(conteudo):
+        inicio = time.perf_counter()
+        await funcao(conteudo)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    # Uma rodada fora da medição (JIT dos backends, caches do alocador)
+    await asyncio.gather(*(funcao(c) for c in conteudos))
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        await asyncio.gather(*(medir(c) for c in conteudos))
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "lote": len(conteudos),
+        "p50_ms": round(float(np.percentile(latencias, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencias, 95)), 2),
+        "imagens_por_segundo": round(len(latencias) / duracao, 2),
+    }
+
+
+def executar_cenario(etapa: str, resolucao: tuple, lotes: list, repeticoes: int) -> dict:
+    """Executado em um processo novo: carrega os modelos e mede todos os lotes."""
+    from app.utils.modelos import aquecer
+    from app.utils.recursos import memoria_processo
+
+    aquecer()
+    funcao = _funcao_da_etapa(etapa)
+    largura, altura = resolucao
+    rss_base = memoria_processo()
+
+    async def medir_lotes():
+        resultados = []
+        for lote in lotes:
+            conteudos = [gerar_imagem(largura, altura, s) for s in range(lote)]
+            resultados.append(await _medir_lote(funcao, conteudos, repeticoes))
+        return resultados
+
+    resultados = asyncio.run(medir_lotes())
+
+    return {
+        "etapa": etapa,
+        "resolucao": f"{largura}x{altura}",
+        "rss_base": rss_base,
+        "rss_pico_mb": _rss_pico_mb(),
+        "lotes": resultados,
+    }
+
+
+def executar_benchmark(resolucoes: list, lotes: list, repeticoes: int) -> dict:
+    cenarios = []
+    contexto = multiprocessing.get_context("spawn")
+    for etapa in ETAPAS:
+        for resolucao in resolucoes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                cenario = pool.submit(
+                    executar_cenario, etapa, resolucao, lotes, repeticoes
+                ).result()
+            print(
+                f"{cenario['etapa']} {cenario['resolucao']}: "
+                + ", ".join(
+                    f"lote {r['lote']} p50 {r['p50_ms']} ms" for r in cenario["lotes"]
+                ),
+                file=sys.stderr,
+            )
+            cenarios.append(cenario)
+
+    return {
+        "ambiente": {
+            "python": platform.python_version(),
+            "torch": version("torch"),
+            "cpus": os.cpu_count(),
+            "ml_backend": os.getenv("ML_BACKEND", "eager"),
+            "ml_executor": os.getenv("ML_EXECUTOR", "thread"),
+            "ml_executor_workers": int(os.getenv("ML_EXECUTOR_WORKERS", 1)),
+            "ml_lote_max": int(os.getenv("ML_LOTE_MAX", 8)),
+            "ml_cascata": os.getenv("ML_CASCATA", "False"),
+        },
+        "repeticoes": repeticoes,
+        "cenarios": cenarios,
+    }
+
+
+def _ler_resolucoes(texto: str) -> list:
+    return [tuple(int(v) for v in item.split("x")) for item in texto.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede latência, vazão e memória da análise de imagens de lesões."
+    )
+    parser.add_argument("--resolucoes", default="640x480,1920x1080,4000x3000")
+    parser.add_argument("--lotes", default="1,4,8")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    relatorio = executar_benchmark(
+        _ler_resolucoes(args.resolucoes),
+        [int(lote) for lote in args.lotes.split(",")],
+        args.repeticoes,
+    )
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
@@ -0,0 +1,130 @@
+"""
+Compara a avaliação de qualidade usada pela API (imagem reduzida a
+ML_QUALIDADE_LADO_MAX e pré-filtro) com o BRISQUE na resolução original, com
+os mesmos limites (boa < 25, ruim < 50).
+
+Uso (a partir de project/):
+    poetry run python -m benchmarks.validar_qualidade
+        [--diretorio app/utils/data/golden] [--concordancia-min 0.95]
+        [--saida qualidade.json]
+
+Precisa de fotos reais de lesões: por padrão o conjunto golden (ML_GOLDEN_DIR).
+Termina com código 1 se a fração de imagens com a mesma classe nas duas
+avaliações ficar abaixo de --concordancia-min ou se o pré-filtro recusar uma
+imagem que o BRISQUE na resolução original considera boa. Rode de novo ao
+alterar ML_QUALIDADE_LADO_MAX ou os limites do pré-filtro, e antes de ligar
+ML_QUALIDADE_REDUZIDA (a avaliação reduzida é feita aqui mesmo com ele desligado).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import torch
+from piq import brisque
+
+from app.utils import qualidade_imagem
+from app.utils.backends_inferencia import EXTENSOES_IMAGEM, ml_golden_dir
+from app.utils.imagem import decodificar_imagem, ml_qualidade_lado_max
+from app.utils.qualidade_imagem import calcular_qualidade_imagem, classificar_score
+
+
+def avaliar_original(conteudo: bytes) -> dict:
+    """BRISQUE na resolução original, sem pré-filtro (como antes da redução)."""
+    img = decodificar_imagem(conteudo)
+    img_array = np.asarray(img, dtype=np.float32) / 255.0
+    img_tensor = torch.from_numpy(img_array).permute(2, 0, 1).unsqueeze(0)
+
+    with torch.no_grad():
+        score = brisque(img_tensor).item()
+    return {"score": round(score, 2), "qualidade": classificar_score(score)}
+
+
+def validar(diretorio: str) -> list:
+    arquivos = sorted(
+        nome for nome in os.listdir(diretorio) if nome.lower().endswith(EXTENSOES_IMAGEM)
+    )
+
+    imagens = []
+    for nome in arquivos:
+        with open(os.path.join(diretorio, nome), "rb") as f:
+            conteudo = f.read()
+
+        original = avaliar_original(conteudo)
+        reduzida = calcular_qualidade_imagem(conteudo)
+        imagens.append({"imagem": nome, "original": original, "reduzida": reduzida})
+        print(
+            f"{nome}: original {original['score']} ({original['qualidade']}), "
+            f"reduzida {reduzida['score']} ({reduzida['qualidade']})",
+            file=sys.stderr,
+        )
+    return imagens
+
+
+def resumir(imagens: list) -> dict:
+    iguais = [
+        i for i in imagens if i["original"]["qualidade"] == i["reduzida"]["qualidade"]
+    ]
+    diferencas = [
+        abs(i["original"]["score"] - i["reduzida"]["score"])
+        for i in imagens
+        if i["reduzida"]["score"] is not None
+    ]
+    # Pré-filtro recusou (sem score do BRISQUE) uma imagem boa na resolução original
+    recusas_indevidas = [
+        i["imagem"]
+        for i in imagens
+        if i["reduzida"]["score"] is None and i["original"]["qualidade"] == "boa"
+    ]
+
+    return {
+        "imagens": len(imagens),
+        "concordancia": round(len(iguais) / len(imagens), 4),
+        "diferenca_media_score": (
+            round(float(np.mean(diferencas)), 2) if diferencas else None
+        ),
+        "diferenca_max_score": round(max(diferencas), 2) if diferencas else None,
+        "recusas_indevidas": recusas_indevidas,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Valida a avaliação de qualidade em resolução reduzida."
+    )
+    parser.add_argument("--diretorio", default=ml_golden_dir)
+    parser.add_argument("--concordancia-min", type=float, default=0.95)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    # Valida o caminho reduzido independentemente de ML_QUALIDADE_REDUZIDA
+    qualidade_imagem.ml_qualidade_reduzida = True
+
+    imagens = validar(args.diretorio) if os.path.isdir(args.diretorio) else []
+    if not imagens:
+        print(f"Nenhuma imagem em {args.diretorio}: nada foi validado.", file=sys.stderr)
+        sys.exit(1)
+
+    relatorio = {
+        "ml_qualidade_lado_max": ml_qualidade_lado_max,
+        "resumo": resumir(imagens),
+        "imagens": imagens,
+    }
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+    resumo = relatorio["resumo"]
+    if resumo["concordancia"] < args.concordancia_min or resumo["recusas_indevidas"]:
+        print(
+            f"Concordância {resumo['concordancia']} (mínimo {args.concordancia_min}), "
+            f"{len(resumo['recusas_indevidas'])} recusas indevidas do pré-filtro.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
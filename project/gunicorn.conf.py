@@ -0,0 +1,76 @@
+"""
+Configuração do gunicorn para servir a API com vários workers:
+
+    poetry run gunicorn -c gunicorn.conf.py app.main:app
+
+O master importa a aplicação, inicializa o banco e carrega os pesos dos modelos
+antes do fork. Os workers herdam os pesos copy-on-write em vez de cada um
+carregar sua própria cópia do ViT e da ResNet18.
+
+O master não executa inferências: com o pool de threads do PyTorch criado antes
+do fork, os workers travariam na primeira inferência. Cada worker monta o
+backend, aquece os modelos e só então responde pronto em /ready.
+
+Não combina com ML_EXECUTOR=process: os processos do pool são criados com
+spawn e carregam os modelos de novo.
+"""
+
+import asyncio
+import gc
+import os
+
+from app.utils.recursos import cpus_disponiveis, memoria_processo
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY") or cpus_disponiveis())
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+preload_app = True
+
+# Lidas ao importar a aplicação (preload), antes do fork: as threads do PyTorch
+# são divididas entre os workers e o lifespan dos workers não recria o banco
+os.environ.setdefault("ML_SERVIDOR_WORKERS", str(workers))
+os.environ["BANCO_INICIALIZADO"] = "True"
+
+
+def on_starting(server):
+    import torch
+    from app.main import inicializar_banco
+    from app.database.database import engine
+    from app.utils.modelos import configurar_threads_torch, obter_vit, obter_resnet
+
+    async def preparar_banco():
+        await inicializar_banco()
+        # Conexões do asyncpg não podem ser herdadas pelos workers
+        await engine.dispose()
+
+    asyncio.run(preparar_banco())
+
+    configurar_threads_torch()
+    # Uma thread só no master: nada de pool intra-op herdado pelos workers
+    torch.set_num_threads(1)
+
+    try:
+        # Só os pesos; o aquecimento fica no lifespan de cada worker
+        obter_vit()
+        obter_resnet()
+    except Exception as e:
+        # Cada worker tenta de novo no próprio lifespan
+        print(f"Erro ao carregar os modelos no master: {str(e)}")
+
+    # Tira os objetos já criados do alcance do coletor de lixo, que do contrário
+    # escreveria nos cabeçalhos deles e copiaria as páginas em cada worker
+    gc.freeze()
+    print(f"[master {os.getpid()}] Memória após carregar os modelos: {memoria_processo()}")
+
+
+def post_fork(server, worker):
+    import torch
+    from app.utils.modelos import threads_torch
+
+    torch.set_num_threads(threads_torch())
+
+
+def post_worker_init(worker):
+    print(f"[worker {worker.pid}] Memória ao iniciar: {memoria_processo()}")
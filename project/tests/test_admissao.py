@@ -0,0 +1,51 @@
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.admissao import ControleAdmissao
+
+
+def test_fila_cheia_retorna_503_com_retry_after():
+    controle = ControleAdmissao("teste_admissao_cheia", max_em_execucao=1, max_fila=1)
+
+    async def ocupar(liberar):
+        async with controle.admitir():
+            await liberar.wait()
+
+    async def cenario():
+        liberar = asyncio.Event()
+        em_execucao = asyncio.create_task(ocupar(liberar))
+        na_fila = asyncio.create_task(ocupar(liberar))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(HTTPException) as exc:
+            async with controle.admitir():
+                pass
+
+        liberar.set()
+        await asyncio.gather(em_execucao, na_fila)
+        return exc.value
+
+    erro = asyncio.run(cenario())
+    assert erro.status_code == 503
+    assert "Retry-After" in erro.headers
+
+
+def test_sem_rejeitar_aguarda_vaga():
+    controle = ControleAdmissao("teste_admissao_espera", max_em_execucao=1, max_fila=0)
+    ordem = []
+
+    async def tarefa(nome):
+        async with controle.admitir(rejeitar=False):
+            ordem.append(nome)
+            await asyncio.sleep(0.01)
+
+    async def cenario():
+        await asyncio.gather(tarefa("a"), tarefa("b"), tarefa("c"))
+
+    asyncio.run(cenario())
+    assert ordem == ["a", "b", "c"]
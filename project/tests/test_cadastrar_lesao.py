@@ -0,0 +1,134 @@
+import asyncio
+import datetime
+import io
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+# O engine do módulo não é usado: cada teste passa a própria sessão à rota
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from fastapi import BackgroundTasks, HTTPException, UploadFile
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import Headers
+
+from app.api.routes import atendimento_routes
+from app.database import models
+from app.utils.admissao import ControleAdmissao
+
+
+async def criar_banco():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    sessoes = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with sessoes() as sessao:
+        usuario = models.User(email="pesquisador@exemplo.com", cpf="1")
+        paciente = models.Paciente(
+            nome_paciente="Paciente",
+            data_nascimento=datetime.date(2000, 1, 1),
+            sexo="M",
+            cpf_paciente="2",
+            num_cartao_sus="3",
+            endereco_paciente="Rua",
+            telefone_paciente="4",
+            email_paciente="paciente@exemplo.com",
+            autoriza_pesquisa=True,
+        )
+        sessao.add_all([usuario, paciente, models.LocalLesao(nome="Braço")])
+        await sessao.commit()
+        sessao.add(models.Atendimento(paciente_id=paciente.id, user_id=usuario.id))
+        await sessao.commit()
+    return engine, sessoes
+
+
+def arquivo_imagem() -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(b"imagem"),
+        filename="lesao.jpg",
+        headers=Headers({"content-type": "image/jpeg"}),
+    )
+
+
+async def cadastrar(sessoes) -> tuple:
+    async with sessoes() as sessao:
+        with pytest.raises(HTTPException) as exc:
+            await atendimento_routes.cadastrar_lesao(
+                BackgroundTasks(),
+                atendimento_id=1,
+                local_lesao_id=1,
+                descricao_lesao="Lesão",
+                files=[arquivo_imagem()],
+                modo_assincrono=False,
+                db=sessao,
+                current_user=None,
+            )
+        lesoes = await sessao.scalar(select(func.count(models.RegistroLesoes.id)))
+    return exc.value, lesoes
+
+
+def test_requisicao_recusada_na_admissao_nao_cria_lesao(monkeypatch):
+    controle = ControleAdmissao("teste_cadastro_recusado", max_em_execucao=1, max_fila=0)
+    monkeypatch.setattr(atendimento_routes, "admissao_inferencia", controle)
+
+    async def cenario():
+        engine, sessoes = await criar_banco()
+        liberar = asyncio.Event()
+
+        async def ocupar():
+            async with controle.admitir():
+                await liberar.wait()
+
+        ocupada = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        resultado = await cadastrar(sessoes)
+        liberar.set()
+        await ocupada
+        await engine.dispose()
+        return resultado
+
+    erro, lesoes = asyncio.run(cenario())
+    assert erro.status_code == 503
+    assert lesoes == 0
+
+
+def test_timeout_na_classificacao_desfaz_lesao(monkeypatch):
+    removidos = []
+
+    async def analisar_qualidade(conteudo):
+        return {"resultado": {"qualidade": {"qualidade": "boa", "score": 10.0}}}
+
+    async def classificar_analise(analise):
+        raise HTTPException(status_code=504, detail="Tempo limite excedido")
+
+    def agendar_uploads(files, folder_name):
+        async def enviar():
+            return {"url": f"{folder_name}/lesao.jpg"}
+
+        return [asyncio.create_task(enviar()) for _ in files]
+
+    async def remove_from_minio(object_name):
+        removidos.append(object_name)
+
+    monkeypatch.setattr(atendimento_routes, "analisar_qualidade", analisar_qualidade)
+    monkeypatch.setattr(atendimento_routes, "classificar_analise", classificar_analise)
+    monkeypatch.setattr(atendimento_routes, "agendar_uploads", agendar_uploads)
+    monkeypatch.setattr(atendimento_routes, "remove_from_minio", remove_from_minio)
+
+    async def cenario():
+        engine, sessoes = await criar_banco()
+        resultado = await cadastrar(sessoes)
+        await engine.dispose()
+        return resultado
+
+    erro, lesoes = asyncio.run(cenario())
+    assert erro.status_code == 504
+    assert lesoes == 0
+    assert removidos == ["imagens-lesoes/lesao.jpg"]
@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.cascata as cascata
+
+
+def test_cascata_pula_resnet_apenas_com_confianca(monkeypatch):
+    monkeypatch.setattr(cascata, "ml_cascata", True)
+    monkeypatch.setattr(cascata, "ml_cascata_confianca", 0.9)
+
+    confiante = {"classe_original": "melanoma", "confianca": 0.97}
+    ambiguo = {"classe_original": "melanoma", "confianca": 0.6}
+    sem_mapa = {"classe_original": "actinic_keratoses", "confianca": 0.99}
+
+    assert cascata.tipo_pela_cascata(confiante) == "maligno"
+    assert cascata.tipo_pela_cascata(ambiguo) is None
+    assert cascata.tipo_pela_cascata(sem_mapa) is None
+
+
+def test_cascata_desativada_sempre_executa_resnet(monkeypatch):
+    monkeypatch.setattr(cascata, "ml_cascata", False)
+
+    diagnostico = {"classe_original": "melanocytic_Nevi", "confianca": 1.0}
+    assert cascata.tipo_pela_cascata(diagnostico) is None
@@ -0,0 +1,58 @@
+import asyncio
+import time
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi import HTTPException
+
+import app.utils.executor_inferencia as executor_inferencia
+
+
+def somar(a, b):
+    return a + b
+
+
+def test_executa_funcao_fora_do_event_loop():
+    assert asyncio.run(executor_inferencia.executar(somar, 2, 3)) == 5
+
+
+def test_timeout_retorna_504(monkeypatch):
+    monkeypatch.setattr(executor_inferencia.executor, "timeout", 0.05)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(executor_inferencia.executar(time.sleep, 0.3))
+
+    assert exc.value.status_code == 504
+    # Aguarda a tarefa terminar no pool para liberar a vaga
+    time.sleep(0.3)
+
+
+def test_fila_cheia_retorna_503(monkeypatch):
+    monkeypatch.setattr(executor_inferencia.executor, "max_fila", 1)
+
+    async def executar():
+        return await asyncio.gather(
+            executor_inferencia.executar(time.sleep, 0.1),
+            executor_inferencia.executar(time.sleep, 0.1),
+            return_exceptions=True,
+        )
+
+    resultados = asyncio.run(executar())
+
+    assert resultados[0] is None
+    assert isinstance(resultados[1], HTTPException)
+    assert resultados[1].status_code == 503
+
+
+def test_aquecimento_mais_longo_que_o_timeout_fica_pronto(monkeypatch):
+    import app.utils.modelos as modelos
+
+    monkeypatch.setattr(executor_inferencia.executor, "timeout", 0.05)
+    monkeypatch.setattr(modelos, "aquecer", lambda: time.sleep(0.2) or True)
+    monkeypatch.setattr(modelos, "estado", {"pronto": False, "erro": None})
+
+    asyncio.run(modelos.iniciar_aquecimento())
+
+    assert modelos.estado == {"pronto": True, "erro": None}
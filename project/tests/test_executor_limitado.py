@@ -0,0 +1,25 @@
+import asyncio
+import time
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.executor_limitado import ExecutorLimitado
+
+
+def test_vaga_so_e_liberada_quando_a_tarefa_termina():
+    executor = ExecutorLimitado("teste_vaga", "thread", 1, max_fila=1, timeout=0.05)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(executor.executar(time.sleep, 0.3))
+    assert exc.value.status_code == 504
+
+    # A tarefa que estourou o timeout ainda ocupa o pool e a vaga
+    assert executor.submeter(time.sleep, 0) is None
+
+    time.sleep(0.4)
+    assert executor.submeter(time.sleep, 0).result() is None
+    executor.encerrar()
@@ -0,0 +1,50 @@
+import io
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from PIL import Image
+
+import app.utils.imagem as imagem
+
+
+def _jpeg(tamanho) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", tamanho, (150, 100, 80)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_jpeg_decodificado_em_escala_reduzida_sem_ficar_abaixo_do_minimo():
+    conteudo = _jpeg((4000, 3000))
+
+    pequena = imagem.decodificar_imagem(conteudo, (224, 224))
+    assert pequena.size == (500, 375)
+
+    qualidade = imagem.decodificar_imagem(conteudo, (224, 224), lado_minimo=1024)
+    assert qualidade.size == (2000, 1500)
+
+    assert imagem.decodificar_imagem(conteudo).size == (4000, 3000)
+
+
+def test_imagem_acima_do_limite_de_pixels_e_recusada(monkeypatch):
+    monkeypatch.setattr(imagem, "ml_imagem_max_pixels", 1000)
+
+    with pytest.raises(Image.DecompressionBombError):
+        imagem.decodificar_imagem(_jpeg((100, 100)))
+
+
+def test_resize_de_cada_modelo_igual_ao_original():
+    from torchvision import transforms
+
+    original = Image.radial_gradient("L").resize((400, 300)).convert("RGB")
+
+    # ViT: imagem.resize((224, 224)) com o filtro padrão do Pillow (BICUBIC)
+    vit = imagem.redimensionar_para_modelo(original, (224, 224), imagem.FILTRO_VIT)
+    assert vit.tobytes() == original.resize((224, 224)).tobytes()
+
+    # ResNet18: transforms.Resize((224, 224))
+    resnet = imagem.redimensionar_para_modelo(
+        original, (224, 224), imagem.FILTRO_RESNET
+    )
+    assert resnet.tobytes() == transforms.Resize((224, 224))(original).tobytes()
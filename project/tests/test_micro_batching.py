@@ -0,0 +1,83 @@
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.micro_batching import MicroBatcher
+from app.utils.metricas import coletar_metricas
+
+
+def test_agrupa_requisicoes_concorrentes_em_um_lote():
+    lotes = []
+
+    async def processar(itens):
+        lotes.append(list(itens))
+        return [item * 2 for item in itens]
+
+    batcher = MicroBatcher("teste_agrupa", processar, max_lote=8, max_espera_ms=50)
+
+    async def executar():
+        return await asyncio.gather(*(batcher.submeter(i) for i in range(5)))
+
+    resultados = asyncio.run(executar())
+
+    assert resultados == [0, 2, 4, 6, 8]
+    assert lotes == [[0, 1, 2, 3, 4]]
+
+
+def test_respeita_tamanho_maximo_do_lote():
+    lotes = []
+
+    async def processar(itens):
+        lotes.append(len(itens))
+        return itens
+
+    batcher = MicroBatcher("teste_maximo", processar, max_lote=2, max_espera_ms=50)
+
+    async def executar():
+        return await asyncio.gather(*(batcher.submeter(i) for i in range(5)))
+
+    assert asyncio.run(executar()) == [0, 1, 2, 3, 4]
+    assert lotes == [2, 2, 1]
+
+    metricas = coletar_metricas()
+    assert metricas["teste_maximo_tamanho_lote"]["total"] == 3
+    assert metricas["teste_maximo_espera_fila_ms"]["total"] == 5
+
+
+def test_erro_no_lote_propaga_para_todos_os_chamadores():
+    async def processar(itens):
+        raise RuntimeError("falha no modelo")
+
+    batcher = MicroBatcher("teste_erro", processar, max_lote=4, max_espera_ms=5)
+
+    async def executar():
+        return await asyncio.gather(
+            *(batcher.submeter(i) for i in range(2)), return_exceptions=True
+        )
+
+    resultados = asyncio.run(executar())
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+
+def test_lotes_rodam_em_paralelo_ate_o_limite():
+    em_execucao = 0
+    pico = 0
+
+    async def processar(itens):
+        nonlocal em_execucao, pico
+        em_execucao += 1
+        pico = max(pico, em_execucao)
+        await asyncio.sleep(0.05)
+        em_execucao -= 1
+        return itens
+
+    batcher = MicroBatcher(
+        "teste_paralelo", processar, max_lote=1, max_espera_ms=0, max_em_execucao=2
+    )
+
+    async def executar():
+        return await asyncio.gather(*(batcher.submeter(i) for i in range(6)))
+
+    assert asyncio.run(executar()) == [0, 1, 2, 3, 4, 5]
+    assert pico == 2
@@ -0,0 +1,255 @@
+import sys
+import os
+import asyncio
+import hashlib
+import io
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+import app.utils.minio as minio_utils
+
+
+class MinioFalso:
+    instancias = 0
+
+    def __init__(self, **kwargs):
+        MinioFalso.instancias += 1
+        self.consultas_bucket = 0
+        self.objetos = {}
+
+    def bucket_exists(self, bucket):
+        self.consultas_bucket += 1
+        return False
+
+    def make_bucket(self, bucket):
+        pass
+
+    def put_object(
+        self, bucket_name, object_name, data, length, content_type, part_size=0,
+        num_parallel_uploads=3,
+    ):
+        if length >= 0:
+            self.objetos[object_name] = data.read()
+            return
+        # Sem threads do SDK lendo partes à frente
+        assert num_parallel_uploads == 1
+        # Como o SDK com tamanho desconhecido: lê uma parte (+1 byte) por vez
+        partes = []
+        while True:
+            parte = data.read(part_size + 1)
+            if not parte:
+                break
+            partes.append(parte)
+        self.objetos[object_name] = b"".join(partes)
+
+
+def test_cliente_e_bucket_preparados_uma_vez(monkeypatch):
+    monkeypatch.setattr(minio_utils, "Minio", MinioFalso)
+    monkeypatch.setattr(minio_utils, "_client", None)
+    monkeypatch.setattr(minio_utils, "_bucket_pronto", False)
+    monkeypatch.setattr(MinioFalso, "instancias", 0)
+
+    async def enviar():
+        for i in range(3):
+            await minio_utils.upload_bytes_to_minio(b"abc", f"{i}.jpg", "image/jpeg", "testes")
+
+    asyncio.run(enviar())
+
+    client = minio_utils.get_minio_client()
+    assert MinioFalso.instancias == 1
+    assert client.consultas_bucket == 1
+    assert len(client.objetos) == 3
+
+
+def _upload_file(conteudo, size=None):
+    return UploadFile(
+        io.BytesIO(conteudo),
+        size=size,
+        filename="foto.jpg",
+        headers=Headers({"content-type": "image/jpeg"}),
+    )
+
+
+def test_upload_em_streaming_calcula_tamanho_e_hash(monkeypatch):
+    monkeypatch.setattr(minio_utils, "Minio", MinioFalso)
+    monkeypatch.setattr(minio_utils, "_client", None)
+    monkeypatch.setattr(minio_utils, "_bucket_pronto", True)
+    monkeypatch.setattr(minio_utils, "minio_tamanho_parte", 1024)
+
+    conteudo = os.urandom(5000)
+    arquivo = _upload_file(conteudo)
+    metadata = asyncio.run(minio_utils.upload_to_minio(arquivo, "testes"))
+
+    assert metadata["tamanho"] == len(conteudo)
+    assert metadata["sha256"] == hashlib.sha256(conteudo).hexdigest()
+    assert minio_utils.get_minio_client().objetos[metadata["url"]] == conteudo
+    # O arquivo volta ao início para quem ainda for lê-lo
+    assert arquivo.file.tell() == 0
+
+
+def test_upload_em_streaming_interrompe_acima_do_limite(monkeypatch):
+    monkeypatch.setattr(minio_utils, "Minio", MinioFalso)
+    monkeypatch.setattr(minio_utils, "_client", None)
+    monkeypatch.setattr(minio_utils, "_bucket_pronto", True)
+    monkeypatch.setattr(minio_utils, "minio_tamanho_parte", 64 * 1024)
+
+    # Tamanho desconhecido: só é detectado durante a leitura
+    arquivo = _upload_file(os.urandom(2 * 1024 * 1024))
+    with pytest.raises(HTTPException) as erro:
+        asyncio.run(minio_utils.upload_to_minio(arquivo, "testes", max_size_mb=1))
+
+    assert erro.value.status_code == 400
+    assert minio_utils.get_minio_client().objetos == {}
+
+
+def test_upload_nao_bloqueia_o_event_loop(monkeypatch):
+    import time
+    from app.utils.metricas import coletar_metricas
+
+    class MinioLento(MinioFalso):
+        def put_object(self, *args, **kwargs):
+            time.sleep(0.3)
+            super().put_object(*args, **kwargs)
+
+    monkeypatch.setattr(minio_utils, "Minio", MinioLento)
+    monkeypatch.setattr(minio_utils, "_client", None)
+    monkeypatch.setattr(minio_utils, "_bucket_pronto", True)
+
+    async def cenario():
+        batidas = 0
+
+        async def relogio():
+            nonlocal batidas
+            while True:
+                await asyncio.sleep(0.01)
+                batidas += 1
+
+        tarefa = asyncio.create_task(relogio())
+        await minio_utils.upload_bytes_to_minio(b"abc", "a.jpg", "image/jpeg", "testes")
+        tarefa.cancel()
+        return batidas
+
+    # O event loop continuou atendendo durante o PUT de 300 ms
+    assert asyncio.run(cenario()) >= 10
+    assert coletar_metricas()["armazenamento_upload_ms"]["total"] >= 1
+
+
+def test_uploads_agendados_respeitam_limite_e_ordem(monkeypatch):
+    import threading
+    import time
+
+    ativos = 0
+    maximo = 0
+    trava = threading.Lock()
+
+    class MinioContador(MinioFalso):
+        def put_object(self, *args, **kwargs):
+            nonlocal ativos, maximo
+            with trava:
+                ativos += 1
+                maximo = max(maximo, ativos)
+            time.sleep(0.05)
+            super().put_object(*args, **kwargs)
+            with trava:
+                ativos -= 1
+
+    monkeypatch.setattr(minio_utils, "Minio", MinioContador)
+    monkeypatch.setattr(minio_utils, "_client", None)
+    monkeypatch.setattr(minio_utils, "_bucket_pronto", True)
+    monkeypatch.setattr(minio_utils, "minio_uploads_simultaneos", 2)
+
+    conteudos = [os.urandom(100) for _ in range(5)]
+
+    async def enviar():
+        tarefas = minio_utils.agendar_uploads(
+            [_upload_file(c) for c in conteudos], "testes"
+        )
+        return await asyncio.gather(*tarefas)
+
+    resultados = asyncio.run(enviar())
+
+    assert maximo == 2
+    objetos = minio_utils.get_minio_client().objetos
+    assert [objetos[r["url"]] for r in resultados] == conteudos
+
+
+def test_verificacao_do_upload_direto_remove_objeto_divergente(monkeypatch):
+    import types
+
+    class MinioComStat(MinioFalso):
+        def stat_object(self, bucket, nome):
+            conteudo = self.objetos[nome]
+            return types.SimpleNamespace(
+                size=len(conteudo),
+                etag=hashlib.md5(conteudo).hexdigest(),
+                content_type="image/jpeg",
+            )
+
+        def remove_object(self, bucket, nome):
+            del self.objetos[nome]
+
+    monkeypatch.setattr(minio_utils, "Minio", MinioComStat)
+    monkeypatch.setattr(minio_utils, "_client", None)
+
+    client = minio_utils.get_minio_client()
+    client.objetos["imagens-lesoes/a.jpg"] = b"abc"
+    client.objetos["imagens-lesoes/b.jpg"] = b"abc"
+
+    metadata = asyncio.run(
+        minio_utils.verificar_objeto(
+            "imagens-lesoes/a.jpg", hashlib.md5(b"abc").hexdigest(), ["image/jpeg"]
+        )
+    )
+    assert metadata["tamanho"] == 3
+
+    with pytest.raises(HTTPException) as erro:
+        asyncio.run(minio_utils.verificar_objeto("imagens-lesoes/b.jpg", "0" * 32))
+    assert erro.value.status_code == 400
+    assert "imagens-lesoes/b.jpg" not in client.objetos
+
+
+def test_timeout_nao_reposiciona_arquivo_durante_o_envio(monkeypatch):
+    import threading
+    from app.utils import executor_armazenamento
+
+    continuar = threading.Event()
+    terminou = threading.Event()
+
+    class MinioTravado(MinioFalso):
+        def put_object(self, *args, **kwargs):
+            data = kwargs["data"]
+            primeira = data.read(kwargs["part_size"] + 1)
+            # O chamador desiste (504) enquanto o PUT ainda está lendo
+            continuar.wait(5)
+            resto = data.read()
+            self.objetos[kwargs["object_name"]] = primeira + resto
+            terminou.set()
+
+    monkeypatch.setattr(minio_utils, "Minio", MinioTravado)
+    monkeypatch.setattr(minio_utils, "_client", None)
+    monkeypatch.setattr(minio_utils, "_bucket_pronto", True)
+    monkeypatch.setattr(minio_utils, "minio_tamanho_parte", 1024)
+    monkeypatch.setattr(executor_armazenamento.executor, "timeout", 0.05)
+
+    conteudo = os.urandom(5000)
+    arquivo = _upload_file(conteudo)
+    with pytest.raises(HTTPException) as erro:
+        asyncio.run(minio_utils.upload_to_minio(arquivo, "testes"))
+    assert erro.value.status_code == 504
+
+    # O ponteiro segue onde o PUT parou até ele terminar de ler
+    assert arquivo.file.tell() == 1025
+    continuar.set()
+    assert terminou.wait(5)
+
+    objetos = minio_utils.get_minio_client().objetos
+    assert list(objetos.values()) == [conteudo]
+    # A vaga do pool só é liberada depois do retorno de _enviar_arquivo
+    import time
+    limite = time.monotonic() + 5
+    while executor_armazenamento.executor._pendentes and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert arquivo.file.tell() == 0
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from PIL import Image
+
+from app.utils import qualidade_imagem
+
+
+def test_imagem_grande_e_reduzida_antes_do_brisque(monkeypatch):
+    monkeypatch.setattr(qualidade_imagem, "ml_qualidade_reduzida", True)
+    imagem = Image.new("RGB", (4000, 3000))
+    tensor = qualidade_imagem.preprocessar(imagem)
+
+    assert max(tensor.shape[2:]) == qualidade_imagem.ml_qualidade_lado_max
+    assert tensor.shape[2] * 4 == tensor.shape[3] * 3
+
+
+def test_prefiltro_recusa_imagem_lisa_e_aceita_textura(monkeypatch):
+    monkeypatch.setattr(qualidade_imagem, "ml_qualidade_reduzida", True)
+    lisa = qualidade_imagem.preprocessar(Image.new("RGB", (300, 300), (120, 90, 80)))
+    resultado = qualidade_imagem.prefiltrar(lisa)
+    assert resultado["qualidade"] == "péssima"
+
+    rng = np.random.default_rng(0)
+    ruido = rng.integers(40, 215, size=(300, 300, 3), dtype=np.uint8)
+    texturizada = qualidade_imagem.preprocessar(Image.fromarray(ruido))
+    assert qualidade_imagem.prefiltrar(texturizada) is None
+
+
+def test_prefiltro_recusa_imagem_escura(monkeypatch):
+    monkeypatch.setattr(qualidade_imagem, "ml_qualidade_reduzida", True)
+    rng = np.random.default_rng(0)
+    escura = rng.integers(0, 4, size=(300, 300, 3), dtype=np.uint8)
+    escura[::2, ::2] = 60
+
+    resultado = qualidade_imagem.prefiltrar(
+        qualidade_imagem.preprocessar(Image.fromarray(escura))
+    )
+    assert resultado["erro"] == "A imagem está muito escura ou muito clara."
+
+
+def test_sem_flag_avalia_na_resolucao_original_sem_prefiltro(monkeypatch):
+    monkeypatch.setattr(qualidade_imagem, "ml_qualidade_reduzida", False)
+    chamadas = []
+    monkeypatch.setattr(qualidade_imagem, "prefiltrar", chamadas.append)
+
+    tensor = qualidade_imagem.preprocessar(Image.new("RGB", (2000, 1500), (120, 90, 80)))
+    assert tuple(tensor.shape[2:]) == (1500, 2000)
+
+    qualidade_imagem.calcular_qualidade_tensor(tensor[:, :, :200, :200])
+    assert chamadas == []
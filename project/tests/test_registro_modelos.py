@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.registro_modelos as registro
+
+
+def test_versao_gravada_define_a_versao_ativa(monkeypatch, tmp_path):
+    monkeypatch.setattr(registro, "ml_versoes_dir", str(tmp_path))
+    monkeypatch.setattr(registro, "_ativa", None)
+    monkeypatch.setattr(registro, "_versao_remota", None)
+    (tmp_path / "v2").mkdir()
+
+    assert registro.listar_versoes() == ["padrao", "v2"]
+    # Sem versão gravada, vale a padrão com o identificador antigo
+    assert registro.versao_ativa() == registro.ml_versao_modelos
+
+    registro._gravar_versao("v2")
+    assert registro.versao_ativa() == "v2"
+    # O arquivo ativa não é listado como versão
+    assert registro.listar_versoes() == ["padrao", "v2"]
+
+
+def test_versao_remota_prevalece_sem_modelos_locais(monkeypatch, tmp_path):
+    monkeypatch.setattr(registro, "ml_versoes_dir", str(tmp_path))
+    monkeypatch.setattr(registro, "_ativa", None)
+    monkeypatch.setattr(registro, "_versao_remota", None)
+
+    registro.definir_versao_remota("v3")
+    registro.definir_versao_remota(None)
+    assert registro.versao_ativa() == "v3"
+
+
+def test_ativacao_no_pool_de_processos_sem_timeout_da_inferencia(monkeypatch):
+    import asyncio
+    import time
+    import app.utils.executor_inferencia as executor_inferencia
+
+    # O pool continua de threads: a função substituta não é serializável
+    monkeypatch.setattr(executor_inferencia, "ml_executor_tipo", "process")
+    monkeypatch.setattr(executor_inferencia.executor, "timeout", 0.05)
+
+    def ativar_versao(nome):
+        # Carregar, montar o backend e aquecer demora mais que uma inferência
+        time.sleep(0.2)
+        return nome
+
+    monkeypatch.setattr(registro, "ativar_versao", ativar_versao)
+
+    assert asyncio.run(registro.ativar("v2")) == {"versao": "v2", "versao_modelo": "v2"}
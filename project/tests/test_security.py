@@ -53,4 +53,26 @@ def test_verify_user_invite_token():
     assert result is False
 
     result = asyncio.run(security.verify_user_invite_token(token, "differenttoken", token_used=False))
-    assert result is False
\ No newline at end of file
+    assert result is False
+
+def test_upload_token_vinculado_ao_destino_e_usuario():
+    token = security.generate_upload_token(
+        "imagens-lesoes/imagens-lesoes_1.jpg", "imagem-lesao", 7, 3, 900
+    )
+
+    assert security.verify_upload_token(
+        token, "imagens-lesoes/imagens-lesoes_1.jpg", "imagem-lesao", 7, 3
+    )
+    # Outro arquivo, outra lesão ou outro usuário
+    assert not security.verify_upload_token(
+        token, "imagens-lesoes/imagens-lesoes_2.jpg", "imagem-lesao", 7, 3
+    )
+    assert not security.verify_upload_token(
+        token, "imagens-lesoes/imagens-lesoes_1.jpg", "imagem-lesao", 8, 3
+    )
+    assert not security.verify_upload_token(
+        token, "imagens-lesoes/imagens-lesoes_1.jpg", "imagem-lesao", 7, 4
+    )
+    assert not security.verify_upload_token(
+        "invalido", "imagens-lesoes/imagens-lesoes_1.jpg", "imagem-lesao", 7, 3
+    )